@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Integration with the pytest-benchmark plugin.
+
+Calls measured by the 'benchmark' fixture run the code under test over and
+over again, so capturing its logs would mostly measure the capturing itself
+(and accumulate records without limit).  Records emitted while measuring
+are only counted instead, the final (unmeasured) call is captured as usual.
+"""
+from __future__ import absolute_import, division, print_function
+
+from contextlib import contextmanager
+
+
+@contextmanager
+def suppressing_in_benchmark(benchmark, handler):
+    """Make the benchmark fixture suppress records of the handler while
+    measuring.
+
+    Does nothing for fixtures not known to support that.
+    """
+    make_runner = getattr(benchmark, '_make_runner', None)
+    if make_runner is None:  # not a pytest-benchmark fixture (or too new)
+        yield
+        return
+
+    def suppressing_make_runner(function_to_benchmark, args, kwargs):
+        runner = make_runner(function_to_benchmark, args, kwargs)
+
+        def suppressing_runner(*args, **kwargs):
+            with handler.suppressing_records():
+                return runner(*args, **kwargs)
+        return suppressing_runner
+
+    benchmark._make_runner = suppressing_make_runner
+    try:
+        yield
+    finally:
+        del benchmark._make_runner
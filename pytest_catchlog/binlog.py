@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Compact binary encoding of log records.
+
+A file starts with the MAGIC header followed by length-prefixed frames.
+Each frame is either a string definition (logger names, paths, message
+templates, test node ids and phases are all interned) or a record
+referring to previously defined strings by their ids.
+"""
+from __future__ import absolute_import, division, print_function
+
+import ast
+import logging
+import os.path
+import struct
+
+from pytest_catchlog.formatting import FastFormatter
+
+
+MAGIC = b'CATCHLOG\x01'
+
+# Payload length.
+FRAME_HEADER = struct.Struct('>I')
+# b'S', string id; followed by the string itself (utf-8).
+STRING_FRAME = struct.Struct('>cI')
+# b'R', levelno, created, lineno, and string ids of logger name, pathname,
+# message template, node id and phase; followed by the length of the args
+# repr(), the args repr() itself and the exception text (all utf-8).
+RECORD_FRAME = struct.Struct('>cidIIIIII')
+LENGTH = struct.Struct('>I')
+
+STRING_TAG = b'S'
+RECORD_TAG = b'R'
+
+_formatter = FastFormatter()
+
+
+def _to_bytes(s):
+    if isinstance(s, bytes):
+        return s
+    return s.encode('utf-8')
+
+
+def _to_text(b):
+    return b.decode('utf-8', 'replace')
+
+
+class BinaryLogHandler(logging.Handler):
+    """A logging handler that writes records to a file in binary form.
+
+    Messages are not formatted at all: the template and the repr() of its
+    arguments are stored instead, along with the node id and the phase of
+    the test being run.  The file is opened (and truncated) on first use.
+    """
+
+    def __init__(self, filename):
+        """Creates a new log handler."""
+
+        logging.Handler.__init__(self)
+        self.filename = os.path.abspath(filename)
+        self.stream = None
+        self.strings = {}
+        self.nodeid = self.phase = ''
+
+    def set_context(self, nodeid='', phase=''):
+        """Set the test node id and phase stored along with records."""
+
+        self.nodeid, self.phase = nodeid, phase
+
+    def _intern(self, s):
+        string_id = self.strings.get(s)
+        if string_id is None:
+            string_id = self.strings[s] = len(self.strings)
+            payload = STRING_FRAME.pack(STRING_TAG, string_id) + _to_bytes(s)
+            self.stream.write(FRAME_HEADER.pack(len(payload)) + payload)
+        return string_id
+
+    def emit(self, record):
+        """Write the record into the file."""
+
+        try:
+            if self.stream is None:
+                self.stream = open(self.filename, 'wb')
+                self.stream.write(MAGIC)
+
+            if record.exc_info and not record.exc_text:
+                record.exc_text = _formatter.formatException(record.exc_info)
+
+            msg = record.msg
+            if not isinstance(msg, type(u'')) and not isinstance(msg, bytes):
+                msg = str(msg)
+            args_repr = _to_bytes(repr(record.args)) if record.args else b''
+
+            payload = RECORD_FRAME.pack(
+                RECORD_TAG,
+                record.levelno,
+                record.created,
+                record.lineno or 0,
+                self._intern(record.name),
+                self._intern(record.pathname),
+                self._intern(msg),
+                self._intern(self.nodeid),
+                self._intern(self.phase),
+            ) + LENGTH.pack(len(args_repr)) + args_repr
+            if record.exc_text:
+                payload += _to_bytes(record.exc_text)
+
+            self.stream.write(FRAME_HEADER.pack(len(payload)) + payload)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Flush the underlying file, if any."""
+
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        """Close this log handler and its underlying file."""
+
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+                self.strings = {}
+        finally:
+            self.release()
+        logging.Handler.close(self)
+
+
+def _make_args(args_repr):
+    if not args_repr:
+        return None
+    try:
+        return ast.literal_eval(args_repr)
+    except (ValueError, SyntaxError):
+        return args_repr
+
+
+def make_record(levelno, created, name, pathname, lineno, msg, args_repr,
+                exc_text, nodeid, phase):
+    args = _make_args(args_repr)
+    if isinstance(args, (tuple, dict)):
+        try:
+            msg % args  # make sure the record can be rendered
+        except (TypeError, ValueError, KeyError):
+            args = repr(args)
+    if args is not None and not isinstance(args, (tuple, dict)):
+        # Arguments couldn't be restored, show them along with the template.
+        msg, args = u'{0} % {1}'.format(msg, args), None
+
+    filename = os.path.basename(pathname)
+    return logging.makeLogRecord({
+        'name': name,
+        'levelno': levelno,
+        'levelname': logging.getLevelName(levelno),
+        'pathname': pathname,
+        'filename': filename,
+        'module': os.path.splitext(filename)[0],
+        'lineno': lineno,
+        'msg': msg,
+        'args': args,
+        'exc_info': None,
+        'exc_text': exc_text or None,
+        'created': created,
+        'msecs': (created - int(created)) * 1000,
+        'nodeid': nodeid,
+        'phase': phase,
+    })
+
+
+def iter_records(stream):
+    """Read records written by BinaryLogHandler from a binary stream.
+
+    Records are yielded as logging.LogRecord instances, having two extra
+    attributes: 'nodeid' and 'phase'.
+    """
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Not a binary catchlog file')
+
+    strings = {}
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return  # EOF (or a frame torn by an interrupted session)
+        length, = FRAME_HEADER.unpack(header)
+        payload = stream.read(length)
+        if len(payload) < length:
+            return
+
+        tag = payload[:1]
+        if tag == STRING_TAG:
+            _, string_id = STRING_FRAME.unpack_from(payload)
+            strings[string_id] = _to_text(payload[STRING_FRAME.size:])
+
+        elif tag == RECORD_TAG:
+            (_, levelno, created, lineno, name_id, pathname_id, msg_id,
+             nodeid_id, phase_id) = RECORD_FRAME.unpack_from(payload)
+            offset = RECORD_FRAME.size
+            args_length, = LENGTH.unpack_from(payload, offset)
+            offset += LENGTH.size
+            args_repr = _to_text(payload[offset:offset + args_length])
+            exc_text = _to_text(payload[offset + args_length:])
+
+            yield make_record(levelno, created,
+                              strings[name_id], strings[pathname_id], lineno,
+                              strings[msg_id], args_repr, exc_text,
+                              strings[nodeid_id], strings[phase_id])
+
+        else:
+            raise ValueError('Unknown frame type: {0!r}'.format(tag))
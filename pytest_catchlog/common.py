@@ -7,6 +7,21 @@ from contextlib import closing, contextmanager
 import py
 
 
+class lazy_property(object):
+    """A property computed on first access, then stored on the instance."""
+
+    def __init__(self, func):
+        self.func = func
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.__name__] = self.func(obj)
+        return value
+
+
 def get_logger_obj(logger=None):
     """Get a logger object that can be specified by its name, or passed as is.
 
@@ -30,6 +45,20 @@ def logging_at_level(level, logger=None):
         logger.setLevel(orig_level)
 
 
+@contextmanager
+def handler_at_level(level, handler, logger=None):
+    """Context manager that sets the level of a handler attached to a logger.
+
+    The logger level is lowered as well if needed for the handler to ever
+    see records of that level.
+    """
+    logger = get_logger_obj(logger)
+
+    with logging_at_level(level, handler):
+        with logging_at_level(min(handler.level, logger.level), logger):
+            yield
+
+
 @contextmanager
 def logging_using_handler(handler, logger=None):
     """Context manager that safely registers a given handler."""
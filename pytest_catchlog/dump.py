@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Render a log file written by 'py.test --log-file-binary'.
+
+Usage::
+
+    python -m pytest_catchlog.dump pytest.log --nodeid test_foo --level INFO
+"""
+from __future__ import absolute_import, division, print_function
+
+import io
+import logging
+import optparse
+import sys
+
+from pytest_catchlog.binlog import iter_records
+from pytest_catchlog.formatting import FastFormatter
+
+
+DEFAULT_DUMP_FORMAT = ('%(nodeid)s %(phase)s '
+                       '%(filename)s:%(lineno)d %(levelname)s %(message)s')
+DEFAULT_DUMP_DATE_FORMAT = '%H:%M:%S'
+
+
+def get_level(level):
+    try:
+        return int(level)
+    except ValueError:
+        levelno = logging.getLevelName(level.upper())
+        if not isinstance(levelno, int):
+            raise ValueError(
+                "'{0}' is not recognized as a logging level".format(level))
+        return levelno
+
+
+def check_level(option, opt, value):
+    try:
+        return get_level(value)
+    except ValueError as e:
+        raise optparse.OptionValueError('option {0}: {1}'.format(opt, e))
+
+
+class Option(optparse.Option):
+    """Also accepts logging levels, by either their name or number."""
+
+    TYPES = optparse.Option.TYPES + ('level',)
+    TYPE_CHECKER = dict(optparse.Option.TYPE_CHECKER, level=check_level)
+
+
+def make_parser():
+    parser = optparse.OptionParser(
+        prog='python -m pytest_catchlog.dump',
+        usage='%prog [options] LOG_FILE',
+        description='Render a log file written with --log-file-binary.',
+        option_class=Option)
+    parser.add_option(
+        '--nodeid', action='append',
+        help=('only show records of tests whose node id contains this '
+              'string (may be repeated).'))
+    parser.add_option(
+        '--phase', type='choice', choices=['setup', 'call', 'teardown'],
+        help='only show records of this test phase.')
+    parser.add_option(
+        '--level', type='level', default=logging.NOTSET,
+        help='only show records of this level or above.')
+    parser.add_option(
+        '--logger', action='append',
+        help='only show records of this logger or its children.')
+    parser.add_option(
+        '--format', default=DEFAULT_DUMP_FORMAT,
+        help=('log format as used by the logging module, %(nodeid)s and '
+              '%(phase)s are also available.'))
+    parser.add_option(
+        '--date-format', default=DEFAULT_DUMP_DATE_FORMAT,
+        help='log date format as used by the logging module.')
+    return parser
+
+
+def parse_args(parser, args, positional):
+    """Parse the options along with a single positional argument."""
+    options, rest = parser.parse_args(args)
+    if len(rest) != 1:
+        parser.error('expected a single {0}'.format(positional))
+    return options, rest[0]
+
+
+def logger_matches(name, loggers):
+    return any(name == logger or name.startswith(logger + '.')
+               for logger in loggers)
+
+
+def filter_records(records, nodeids=(), phase=None, level=logging.NOTSET,
+                   loggers=()):
+    for record in records:
+        if record.levelno < level:
+            continue
+        if phase and record.phase != phase:
+            continue
+        if nodeids and not any(n in record.nodeid for n in nodeids):
+            continue
+        if loggers and not logger_matches(record.name, loggers):
+            continue
+        yield record
+
+
+def main(args=None, out=None):
+    options, log_file = parse_args(make_parser(), args, 'LOG_FILE')
+    out = out or sys.stdout
+    formatter = FastFormatter(options.format, options.date_format)
+
+    with io.open(log_file, 'rb') as stream:
+        for record in filter_records(iter_records(stream),
+                                     nodeids=options.nodeid or (),
+                                     phase=options.phase,
+                                     level=options.level,
+                                     loggers=options.logger or ()):
+            out.write(formatter.format(record) + '\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,11 +3,17 @@ from __future__ import absolute_import, division, print_function
 
 import functools
 import logging
+from collections import namedtuple
+from itertools import islice
 
-import pytest
 import py
 
-from pytest_catchlog.common import catching_logs, logging_at_level
+from pytest_catchlog.common import (catching_logs, handler_at_level,
+                                    logging_at_level)
+
+
+LogCheckpoint = namedtuple('LogCheckpoint', 'handler cleared records text')
+CapturedLogs = namedtuple('CapturedLogs', 'records text')
 
 
 class LogCaptureFixture(object):
@@ -31,6 +37,17 @@ class LogCaptureFixture(object):
         """Returns the list of log records."""
         return self.handler.records
 
+    def iter_lines(self, since=0):
+        """Iterates over lines of the log text, skipping 'since' first ones.
+
+        E.g. to only look at the output of the last step of a test::
+
+            seen = len(list(caplog.iter_lines()))
+            do_step()
+            new_lines = list(caplog.iter_lines(since=seen))
+        """
+        return self.handler.stream.iter_lines(since)
+
     @property
     def record_tuples(self):
         """Returns a list of a striped down version of log records intended
@@ -42,9 +59,40 @@ class LogCaptureFixture(object):
         """
         return [(r.name, r.levelno, r.getMessage()) for r in self.records]
 
+    @property
+    def dropped(self):
+        """Returns the number of records dropped to respect the limit."""
+        return self.handler.dropped
+
     def clear(self):
-        """Reset the list of log records."""
+        """Reset the list of log records and the log text."""
         self.handler.records = []
+        self.handler.stream.truncate()
+        self.handler.dropped = 0
+
+    def checkpoint(self):
+        """Mark the current end of the log records and text.
+
+        Pass the result to since() later on to get what has been logged
+        after this point, e.g. within a single step of a long test.
+        """
+        handler = self.handler
+        return LogCheckpoint(handler, handler.stream.cleared,
+                             len(handler.records), len(handler.stream.chunks))
+
+    def since(self, checkpoint):
+        """Returns a (records, text) pair logged after the checkpoint.
+
+        Everything is returned if the logs have been cleared since then, or
+        the checkpoint comes from another phase (e.g. setup).
+        """
+        handler = self.handler
+        stream = handler.stream
+        if (checkpoint.handler is not handler or
+                checkpoint.cleared != stream.cleared):
+            return CapturedLogs(list(handler.records), stream.getvalue())
+        return CapturedLogs(handler.records[checkpoint.records:],
+                            stream.text_since(checkpoint.text))
 
     def set_level(self, level, logger=None):
         """Sets the level for capturing of logs.
@@ -56,6 +104,12 @@ class LogCaptureFixture(object):
 
         obj = logger and logging.getLogger(logger) or self.handler
         obj.setLevel(level)
+        if obj is self.handler:
+            # Records are only created as long as the root logger allows.
+            # Its level is restored once the test phase is over (and
+            # lowered again on later phases for scoped fixtures).
+            root_logger = logging.getLogger()
+            root_logger.setLevel(min(obj.level, root_logger.level))
 
     def at_level(self, level, logger=None):
         """Context manager that sets the level for capturing of logs.
@@ -65,13 +119,68 @@ class LogCaptureFixture(object):
         logger.
         """
 
-        obj = logger and logging.getLogger(logger) or self.handler
-        return logging_at_level(level, obj)
+        if not logger:
+            return handler_at_level(level, self.handler)
+        return logging_at_level(level, logging.getLogger(logger))
+
+
+class ScopedLogCaptureFixture(LogCaptureFixture):
+    """Provides access and control of log capturing for a module/session."""
+
+    def __init__(self, handler):
+        """Creates a new funcarg."""
+        self._handler = handler
+
+    @property
+    def handler(self):
+        return self._handler
+
+    @property
+    def text(self):
+        """Returns the log text."""
+        return self.handler.getvalue()
+
+    @property
+    def records(self):
+        """Returns the list of log records (only the last ones are kept)."""
+        return list(self.handler.records)
+
+    def iter_lines(self, since=0):
+        """Iterates over lines of the log text, skipping 'since' first ones."""
+        return islice(self.text.splitlines(), since, None)
+
+    def clear(self):
+        """Reset the list of log records."""
+        self.handler.records.clear()
+        self.handler.dropped = 0
+        self.handler.cleared += 1
+
+    def checkpoint(self):
+        """Mark the current end of the log records."""
+        handler = self.handler
+        return LogCheckpoint(handler, handler.cleared,
+                             handler.dropped + len(handler.records), None)
+
+    def since(self, checkpoint):
+        """Returns a (records, text) pair logged after the checkpoint.
+
+        Only records still kept are returned.
+        """
+        handler = self.handler
+        records = handler.records
+        if (checkpoint.handler is handler and
+                checkpoint.cleared == handler.cleared):
+            logged = handler.dropped + len(records) - checkpoint.records
+            records = islice(records, max(len(records) - logged, 0), None)
+        records = list(records)
+        return CapturedLogs(records, handler.getvalue(records))
 
 
 class CallablePropertyMixin(object):
     """Backward compatibility for functions that became properties."""
 
+    reusable = False  # whether a wrapper can be reused for the same value
+
     @classmethod
     def compat_property(cls, func):
         if isinstance(func, property):
@@ -80,13 +189,23 @@ class CallablePropertyMixin(object):
         else:
             make_property = property
 
+        name = func.__name__
+
         @functools.wraps(func)
         def getter(self):
             naked_value = func(self)
+            if cls.reusable:
+                # Don't copy the same (immutable) value over and over again.
+                cache = self.__dict__.setdefault('_compat_values', {})
+                cached_naked, ret = cache.get(name, (None, None))
+                if cached_naked is naked_value:
+                    return ret
             ret = cls(naked_value)
             ret._naked_value = naked_value
             ret._warn_compat = self._warn_compat
-            ret._prop_name = func.__name__
+            ret._prop_name = name
+            if cls.reusable:
+                cache[name] = (naked_value, ret)
             return ret
 
         return make_property(getter)
@@ -105,7 +224,7 @@ class CallableList(CallablePropertyMixin, list):
 
 
 class CallableStr(CallablePropertyMixin, py.builtin.text):
-    pass
+    reusable = True
 
 
 class CompatLogCaptureFixture(LogCaptureFixture):
@@ -139,16 +258,5 @@ class CompatLogCaptureFixture(LogCaptureFixture):
         return self.at_level(level, logger)
 
 
-@pytest.fixture
-def caplog(request):
-    """Access and control log capturing.
-
-    Captured logs are available through the following methods::
-
-    * caplog.text()          -> string containing formatted log output
-    * caplog.records()       -> list of logging.LogRecord instances
-    * caplog.record_tuples() -> list of (logger_name, level, message) tuples
-    """
-    return CompatLogCaptureFixture(request.node)
-
-capturelog = caplog
+# Defined along with the plugin, still importable from here.
+from pytest_catchlog.plugin import caplog, capturelog  # noqa
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import copy
+import logging
+import re
+import time
+import weakref
+from operator import itemgetter
+
+
+_FIELD_RE = re.compile(r'%(?:\(([^)]*)\)|%)')
+
+# {record: {formatter cache key: 'formatted line'}}, shared by all
+# formatters.  Kept aside, so that records are left as they are for
+# handlers serializing their attributes.
+_formatted_lines = weakref.WeakKeyDictionary()
+
+# {exc_info_key(): 'rendered traceback'}, shared by all formatters.
+_exc_text_cache = {}
+_exc_text_order = []  # the keys, least recently used first
+EXC_TEXT_CACHE_SIZE = 256
+
+
+def _tb_shape(tb):
+    shape = []
+    while tb is not None:
+        shape.append((tb.tb_frame.f_code, tb.tb_lineno, tb.tb_lasti))
+        tb = tb.tb_next
+    return tuple(shape)
+
+
+def exc_info_key(exc_info):
+    """Identify how an exception renders: its type, message and traceback.
+
+    Returns None if the exception can't be identified reliably.
+    """
+    _, exc_value, tb = exc_info
+    key, seen = [], set()
+    while exc_value is not None and id(exc_value) not in seen:
+        seen.add(id(exc_value))
+        try:
+            message = str(exc_value)
+        except Exception:
+            return None
+        key.append((type(exc_value), message, _tb_shape(tb)))
+
+        # Python 3 renders chained exceptions as well.
+        cause = getattr(exc_value, '__cause__', None)
+        if cause is None and not getattr(exc_value, '__suppress_context__',
+                                         False):
+            cause = getattr(exc_value, '__context__', None)
+        exc_value, tb = cause, getattr(cause, '__traceback__', None)
+
+    return tuple(key)
+
+
+def detach_exc_info(record, formatter):
+    """Return a copy of the record keeping only the rendered traceback.
+
+    The original record is left as is for other handlers, while the copy no
+    longer holds the traceback (and all its frames) alive.
+    """
+    if not record.exc_text:
+        record.exc_text = formatter.formatException(record.exc_info)
+    detached = copy.copy(record)
+    detached.exc_info = None
+    lines = _formatted_lines.get(record)
+    if lines is not None:
+        _formatted_lines[detached] = lines
+    return detached
+
+
+def formatted_lines(record):
+    """Return the lines the record has been formatted into so far."""
+    try:
+        return list(_formatted_lines.get(record, {}).values())
+    except TypeError:  # can't be weakly referenced
+        return []
+
+
+def _byte_size(line):
+    if isinstance(line, bytes):
+        return len(line)
+    return len(line.encode('utf-8', 'replace'))
+
+
+def formatted_size(record):
+    """The size of the longest line the record has been formatted into, in
+    UTF-8 encoded bytes (as written to a log file).
+    """
+    return max([_byte_size(line) for line in formatted_lines(record)] or [0])
+
+
+class FormattedSizes(object):
+    """Counts each record once, however many handlers it goes through.
+
+    Its size is counted as it grows, formatters of later handlers possibly
+    rendering longer lines.
+    """
+
+    def __init__(self):
+        self.counted = weakref.WeakKeyDictionary()  # {record: size}
+
+    def add(self, record):
+        """Return (whether the record is new, by how many bytes it grew)."""
+
+        counted = self.counted.get(record)
+        size = formatted_size(record)
+        growth = max(size - (counted or 0), 0)
+        if counted is None or growth:
+            self.counted[record] = (counted or 0) + growth
+        return counted is None, growth
+
+
+def compile_format(fmt):
+    """Turn a '%(name)s'-style format into a positional one.
+
+    Returns the positional format along with a function picking the values
+    it needs out of a record's dict, or None if the format can't be
+    compiled (e.g. when it mixes in positional specifiers).
+    """
+    stripped = fmt.replace('%%', '')
+    if stripped.count('%') != stripped.count('%('):
+        return None
+
+    fields = []
+
+    def replace(match):
+        if match.group(1) is None:
+            return '%%'
+        fields.append(match.group(1))
+        return '%'
+
+    positional = _FIELD_RE.sub(replace, fmt)
+
+    if not fields:
+        def pick(values):
+            return ()
+    elif len(fields) == 1:
+        getter = itemgetter(fields[0])
+
+        def pick(values):
+            return (getter(values),)
+    else:
+        pick = itemgetter(*fields)
+
+    return positional, fields, pick
+
+
+class FastFormatter(logging.Formatter):
+    """A drop-in replacement for logging.Formatter with a '%' style format.
+
+    The format string is compiled once into a positional one, so that only
+    fields actually used are looked up for each record. The formatted time
+    is cached for a whole second, which is the resolution of time.strftime().
+    The output is the same as of the stdlib formatter.
+
+    Formatted lines are also remembered for each record, so that all
+    handlers having equivalent formatters (e.g. the capturing one along
+    with the CLI and file ones) render each record just once.
+    """
+
+    def __init__(self, fmt=None, datefmt=None):
+        logging.Formatter.__init__(self, fmt, datefmt)
+        self._fast_fmt = fmt or '%(message)s'  # the stdlib default
+        self._compiled = compile_format(self._fast_fmt)
+        if self._compiled is not None:
+            self._uses_time = 'asctime' in self._compiled[1]
+        else:
+            self._uses_time = self._fast_fmt.find('%(asctime)') >= 0
+        self._time_cache = (None, None)  # (second, formatted)
+        # Formatters sharing this key produce identical output.
+        self._cache_key = (self._fast_fmt,
+                           datefmt if self._uses_time else None,
+                           self.converter)
+
+    def usesTime(self):
+        return self._uses_time
+
+    def formatException(self, ei):
+        """Render an exception, reusing the text of an identical one.
+
+        E.g. 'logger.exception()' in a retry loop renders the very same
+        traceback over and over again.
+        """
+        key = exc_info_key(ei)
+        if key is None:
+            return logging.Formatter.formatException(self, ei)
+
+        text = _exc_text_cache.get(key)
+        if text is None:
+            text = logging.Formatter.formatException(self, ei)
+            if len(_exc_text_cache) >= EXC_TEXT_CACHE_SIZE:
+                del _exc_text_cache[_exc_text_order.pop(0)]
+            _exc_text_cache[key] = text
+            _exc_text_order.append(key)
+        elif _exc_text_order[-1] != key:
+            _exc_text_order.remove(key)
+            _exc_text_order.append(key)
+        return text
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached_second, formatted = self._time_cache
+        if cached_second != second or datefmt != self.datefmt:
+            formatted = self._format_second(record, datefmt)
+            if datefmt == self.datefmt:
+                self._time_cache = (second, formatted)
+
+        if datefmt:
+            return formatted
+        msec_format = getattr(self, 'default_msec_format', '%s,%03d')
+        if not msec_format:  # Python 3.9+ allows turning msecs off
+            return formatted
+        return msec_format % (formatted, record.msecs)
+
+    def _format_second(self, record, datefmt):
+        ct = self.converter(record.created)
+        if not datefmt:
+            datefmt = getattr(self, 'default_time_format',
+                              '%Y-%m-%d %H:%M:%S')
+        return time.strftime(datefmt, ct)
+
+    def formatMessage(self, record):
+        if self._compiled is None:
+            return logging.Formatter.formatMessage(self, record)
+        positional, _, pick = self._compiled
+        return positional % pick(record.__dict__)
+
+    def format(self, record):
+        try:
+            lines = _formatted_lines.get(record)
+            if lines is None:
+                lines = _formatted_lines[record] = {}
+        except TypeError:  # can't be weakly referenced, don't cache
+            return self._format(record)
+
+        formatted = lines.get(self._cache_key)
+        if formatted is None:
+            formatted = lines[self._cache_key] = self._format(record)
+        return formatted
+
+    def _format(self, record):
+        if (self._compiled is None or record.exc_info or record.exc_text or
+                getattr(record, 'stack_info', None)):
+            # Rare enough to leave the details to the stdlib.
+            return logging.Formatter.format(self, record)
+
+        record.message = record.getMessage()
+        if self._uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        return self.formatMessage(record)
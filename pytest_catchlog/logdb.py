@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""Session logs stored in an SQLite database, for fast post-run queries.
+
+Records are turned into rows on the test thread (which only appends them to
+a list), a background thread inserts them with executemany() in periodic
+transactions.
+"""
+from __future__ import absolute_import, division, print_function
+
+import logging
+import os
+import os.path
+import sqlite3
+import sys
+import threading
+import traceback
+
+from pytest_catchlog.formatting import FastFormatter
+
+
+DEFAULT_WRITE_INTERVAL = 0.5  # seconds
+
+SCHEMA = [
+    '''CREATE TABLE records (
+        id INTEGER PRIMARY KEY,
+        nodeid TEXT,
+        phase TEXT,
+        created REAL,
+        name TEXT,
+        levelno INTEGER,
+        pathname TEXT,
+        lineno INTEGER,
+        message TEXT,
+        exc_text TEXT
+    )''',
+    'CREATE INDEX records_nodeid ON records (nodeid)',
+    'CREATE INDEX records_levelno ON records (levelno)',
+    'CREATE INDEX records_name ON records (name)',
+]
+FTS_SCHEMA = [
+    'CREATE VIRTUAL TABLE records_fts USING fts4(message)',
+]
+
+INSERT = ('INSERT INTO records (nodeid, phase, created, name, levelno, '
+          'pathname, lineno, message, exc_text) '
+          'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+INSERT_FTS = ('INSERT INTO records_fts (docid, message) '
+              'SELECT id, message FROM records WHERE id > ?')
+
+_formatter = FastFormatter()
+
+
+def create_schema(connection, fts=False):
+    """Create the tables and indexes, raising ValueError if 'fts' is set
+    but SQLite was built without full-text search.
+    """
+    for statement in SCHEMA:
+        connection.execute(statement)
+    for statement in (FTS_SCHEMA if fts else []):
+        try:
+            connection.execute(statement)
+        except sqlite3.OperationalError as e:
+            raise ValueError('full-text search is not available in this '
+                             'SQLite build ({0})'.format(e))
+
+
+def check_fts():
+    """Raise ValueError if full-text search is not available."""
+    connection = sqlite3.connect(':memory:')
+    try:
+        create_schema(connection, fts=True)
+    finally:
+        connection.close()
+
+
+def _to_text(s):
+    if isinstance(s, bytes):
+        return s.decode('utf-8', 'replace')
+    return s
+
+
+class SQLiteLogHandler(logging.Handler):
+    """A logging handler that stores records into an SQLite database.
+
+    The database is created anew (along with its indexes, and a full-text
+    index of messages if 'fts' is set) when the handler is created.
+    """
+
+    def __init__(self, filename, fts=False, interval=DEFAULT_WRITE_INTERVAL):
+        """Creates a new log handler, and starts its writer thread."""
+
+        logging.Handler.__init__(self)
+        self.filename = os.path.abspath(filename)
+        self.fts = fts
+        self.interval = interval
+        self.nodeid = self.phase = None
+        self.pending = []
+
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        connection = sqlite3.connect(self.filename)
+        try:
+            with connection:
+                create_schema(connection, fts)
+        finally:
+            connection.close()
+
+        self._closing = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop,
+                                        name='catchlog-logdb-writer')
+        self._writer.daemon = True
+        self._writer.start()
+
+    def set_context(self, nodeid=None, phase=None):
+        """Set the test node id and phase stored along with records."""
+
+        self.nodeid, self.phase = nodeid, phase
+
+    def emit(self, record):
+        """Queue the record to be written (called with the lock held)."""
+
+        try:
+            if record.exc_info and not record.exc_text:
+                record.exc_text = _formatter.formatException(record.exc_info)
+            self.pending.append((
+                self.nodeid, self.phase, record.created, record.name,
+                record.levelno, record.pathname, record.lineno,
+                _to_text(record.getMessage()), _to_text(record.exc_text)))
+        except Exception:
+            self.handleError(record)
+
+    def _write_loop(self):
+        connection = sqlite3.connect(self.filename)
+        try:
+            closing = False
+            while not closing:
+                self._closing.wait(self.interval)
+                closing = self._closing.is_set()
+                try:
+                    self._write_pending(connection)
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)
+        finally:
+            connection.close()
+
+    def _write_pending(self, connection):
+        self.acquire()
+        try:
+            rows, self.pending = self.pending, []
+        finally:
+            self.release()
+        if not rows:
+            return
+
+        with connection:  # a single transaction
+            if self.fts:
+                last_id = connection.execute(
+                    'SELECT max(id) FROM records').fetchone()[0] or 0
+            connection.executemany(INSERT, rows)
+            if self.fts:
+                connection.execute(INSERT_FTS, (last_id,))
+
+    def close(self):
+        """Write the remaining records and stop the writer thread."""
+
+        self._closing.set()
+        if self._writer.is_alive():
+            self._writer.join()
+        logging.Handler.close(self)
+
+
+def query(connection, nodeids=(), phase=None, level=logging.NOTSET,
+          loggers=(), grep=None, nodeid_prefix=False):
+    """Select records of the given tests and loggers, in the order they
+    were emitted.
+
+    Node ids match exactly along with their parametrized variants (e.g.
+    'test_foo[1]' for 'test_foo'), or by prefix if 'nodeid_prefix' is set.
+    Logger names match their children as well.  Both use the indexes.
+    'grep' uses the full-text index if there is one, and a plain substring
+    match otherwise.
+    """
+    clauses, params = [], []
+    if nodeids:
+        if nodeid_prefix:
+            clause = 'nodeid GLOB ?'
+        else:
+            clause = 'nodeid = ? OR nodeid GLOB ?'
+        clauses.append('(' + ' OR '.join([clause] * len(nodeids)) + ')')
+        for nodeid in nodeids:
+            if nodeid_prefix:
+                params.append(_glob_prefix(nodeid))
+            else:
+                params.extend([nodeid, _glob_prefix(nodeid + '[')])
+    if phase:
+        clauses.append('phase = ?')
+        params.append(phase)
+    if level > logging.NOTSET:
+        clauses.append('levelno >= ?')
+        params.append(level)
+    if loggers:
+        clauses.append('(' + ' OR '.join(['name = ? OR name GLOB ?'] *
+                                         len(loggers)) + ')')
+        for logger in loggers:
+            params.extend([logger, _glob_prefix(logger + '.')])
+    if grep:
+        if has_fts(connection):
+            clauses.append('id IN (SELECT docid FROM records_fts '
+                           'WHERE message MATCH ?)')
+        else:
+            clauses.append("message LIKE '%' || ? || '%'")
+        params.append(grep)
+
+    sql = ('SELECT levelno, created, name, pathname, lineno, message, '
+           'exc_text, nodeid, phase FROM records')
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY id'
+    for row in connection.execute(sql, params):
+        yield make_record(*row)
+
+
+def has_fts(connection):
+    return connection.execute(
+        "SELECT count(*) FROM sqlite_master WHERE name = 'records_fts'"
+    ).fetchone()[0] > 0
+
+
+def _glob_prefix(prefix):
+    # Brackets make the GLOB wildcards match literally.
+    return ''.join('[{0}]'.format(c) if c in '*?[' else c
+                   for c in prefix) + '*'
+
+
+def make_record(levelno, created, name, pathname, lineno, message,
+                exc_text, nodeid, phase):
+    filename = os.path.basename(pathname)
+    return logging.makeLogRecord({
+        'name': name,
+        'levelno': levelno,
+        'levelname': logging.getLevelName(levelno),
+        'pathname': pathname,
+        'filename': filename,
+        'module': os.path.splitext(filename)[0],
+        'lineno': lineno,
+        'msg': message,
+        'args': None,
+        'exc_info': None,
+        'exc_text': exc_text or None,
+        'created': created,
+        'msecs': (created - int(created)) * 1000,
+        'nodeid': nodeid or '',
+        'phase': phase or '',
+    })
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Log volume metrics, counted by the plugin's handlers during the run."""
+from __future__ import absolute_import, division, print_function
+
+import io
+import json
+
+from pytest_catchlog.formatting import FormattedSizes
+
+
+DEFAULT_METRICS_TOP = 20
+
+
+class Counter(object):
+    """Number of records and their formatted bytes."""
+
+    __slots__ = ('records', 'bytes')
+
+    def __init__(self):
+        self.records = self.bytes = 0
+
+    def as_dict(self):
+        return {'records': self.records, 'bytes': self.bytes}
+
+
+class LogMetrics(object):
+    """Counts records per logger and level, and per test."""
+
+    def __init__(self):
+        self.total = Counter()
+        self.loggers = {}  # {('name', 'levelname'): Counter}
+        self.tests = {}  # {'nodeid': Counter}
+        self.nodeid = None
+        self.sizes = FormattedSizes()
+
+    def set_context(self, nodeid=None, phase=None):
+        """Set the node id of the test records are accounted to."""
+
+        self.nodeid = nodeid
+
+    def counted(self, handler):
+        """Make records handled by the handler counted by these metrics."""
+
+        handle = handler.handle
+        add = self.add
+
+        def counted_handle(record):
+            rv = handle(record)
+            if rv:
+                add(record)
+            return rv
+
+        handler.handle = counted_handle
+        return handler
+
+    def _counters_for(self, record):
+        key = (record.name, record.levelname)
+        counter = self.loggers.get(key)
+        if counter is None:
+            counter = self.loggers[key] = Counter()
+        yield counter
+        yield self.total
+        if self.nodeid is not None:
+            counter = self.tests.get(self.nodeid)
+            if counter is None:
+                counter = self.tests[self.nodeid] = Counter()
+            yield counter
+
+    def add(self, record):
+        new, growth = self.sizes.add(record)
+        if not (new or growth):
+            return
+
+        for counter in self._counters_for(record):
+            counter.records += int(new)
+            counter.bytes += growth
+
+    def top_loggers(self, count=DEFAULT_METRICS_TOP):
+        """Return (name, Counter) pairs of loggers emitting the most bytes."""
+
+        loggers = {}
+        for (name, _), counter in self.loggers.items():
+            total = loggers.get(name)
+            if total is None:
+                total = loggers[name] = Counter()
+            total.records += counter.records
+            total.bytes += counter.bytes
+        return _top(loggers, count)
+
+    def top_tests(self, count=DEFAULT_METRICS_TOP):
+        """Return (nodeid, Counter) pairs of tests emitting the most bytes."""
+
+        return _top(self.tests, count)
+
+    def as_dict(self):
+        loggers = {}
+        for (name, levelname), counter in sorted(self.loggers.items()):
+            loggers.setdefault(name, {})[levelname] = counter.as_dict()
+        return {
+            'total': self.total.as_dict(),
+            'loggers': loggers,
+            'tests': dict((nodeid, counter.as_dict())
+                          for nodeid, counter in self.tests.items()),
+            'top_loggers': [dict(counter.as_dict(), name=name)
+                            for name, counter in self.top_loggers()],
+            'top_tests': [dict(counter.as_dict(), nodeid=nodeid)
+                          for nodeid, counter in self.top_tests()],
+        }
+
+    def write(self, filename):
+        """Write the metrics into a file, in the OpenMetrics text format
+        for '.prom' files and as JSON otherwise.
+        """
+        if filename.endswith('.prom'):
+            data = self.openmetrics()
+        else:
+            data = json.dumps(self.as_dict(), indent=2, sort_keys=True)
+        with io.open(filename, 'w', encoding='utf-8') as fh:
+            fh.write(data if isinstance(data, type(u'')) else
+                     data.decode('utf-8'))
+
+    def openmetrics(self):
+        lines = []
+        for what in ('records', 'bytes'):
+            lines.append('# TYPE catchlog_{0} counter'.format(what))
+            for (name, levelname), counter in sorted(self.loggers.items()):
+                lines.append('catchlog_{0}_total{{logger="{1}",level="{2}"}} '
+                             '{3}'.format(what, _label(name), levelname,
+                                          getattr(counter, what)))
+        for what in ('records', 'bytes'):
+            lines.append('# TYPE catchlog_test_{0} counter'.format(what))
+            for nodeid, counter in sorted(self.tests.items()):
+                lines.append('catchlog_test_{0}_total{{nodeid="{1}"}} '
+                             '{2}'.format(what, _label(nodeid),
+                                          getattr(counter, what)))
+        lines.append('# EOF')
+        return u'\n'.join(lines) + u'\n'
+
+
+def _top(counters, count):
+    top = sorted(counters.items(),
+                 key=lambda item: (item[1].bytes, item[1].records),
+                 reverse=True)
+    return top[:count] if count else top
+
+
+def _label(value):
+    return (value.replace('\\', '\\\\')
+                 .replace('"', '\\"')
+                 .replace('\n', '\\n'))
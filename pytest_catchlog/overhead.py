@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Timing of the work the plugin itself does around tests."""
+from __future__ import absolute_import, division, print_function
+
+import math
+import sys
+from contextlib import contextmanager
+from timeit import default_timer
+
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of a sorted non-empty list."""
+    rank = int(math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class OverheadStats(object):
+    """Durations of the plugin's work, e.g. per runtest phase."""
+
+    def __init__(self):
+        self.started = default_timer()
+        self.durations = {}  # {'key': [seconds, ...]}
+
+    def add(self, key, seconds):
+        self.durations.setdefault(key, []).append(seconds)
+
+    @contextmanager
+    def timing(self, key, context):
+        """Run within the context, timing its entry and exit only."""
+
+        start = default_timer()
+        value = context.__enter__()
+        elapsed = default_timer() - start
+
+        exc_info = (None, None, None)
+        try:
+            yield value
+        except BaseException:
+            exc_info = sys.exc_info()
+            raise
+        finally:
+            start = default_timer()
+            try:
+                context.__exit__(*exc_info)
+            finally:
+                self.add(key, elapsed + default_timer() - start)
+
+    def timed_handler(self, handler, key='records'):
+        """Make the handler account its work (e.g. formatting) to 'key'."""
+
+        handle = handler.handle
+        add = self.add
+
+        def timed_handle(record):
+            start = default_timer()
+            try:
+                return handle(record)
+            finally:
+                add(key, default_timer() - start)
+
+        handler.handle = timed_handle
+        return handler
+
+    def total(self):
+        return sum(sum(values) for values in self.durations.values())
+
+    def write_summary(self, terminalreporter, keys):
+        session = default_timer() - self.started
+        total = self.total()
+        terminalreporter.write_sep(
+            '-', 'catchlog overhead: {0:.3f}s total, {1:.1f}% of {2:.2f}s'
+            .format(total, 100 * total / session if session else 0, session))
+        terminalreporter.write_line(
+            '{0:<12} {1:>8} {2:>10}'.format('hook', 'calls', 'total ms') +
+            ''.join('{0:>10}'.format('p{0} us'.format(p))
+                    for p in PERCENTILES) +
+            '{0:>10}'.format('max us'))
+
+        for key in keys:
+            values = sorted(self.durations.get(key, ()))
+            if not values:
+                continue
+            terminalreporter.write_line(
+                '{0:<12} {1:>8} {2:>10.2f}'.format(key, len(values),
+                                                   sum(values) * 1e3) +
+                ''.join('{0:>10.1f}'.format(percentile(values, p) * 1e6)
+                        for p in PERCENTILES) +
+                '{0:>10.1f}'.format(values[-1] * 1e6))
@@ -3,19 +3,24 @@ from __future__ import absolute_import, division, print_function
 
 import logging
 import sys
-from contextlib import closing, contextmanager
+from bisect import bisect_left
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from itertools import islice
 
 import pytest
 import py
 
-from pytest_catchlog.common import catching_logs
-
-# Let the fixtures be discoverable by pytest.
-from pytest_catchlog.fixture import caplog, capturelog
+from pytest_catchlog.common import (catching_logs, lazy_property,
+                                    logging_at_level)
+from pytest_catchlog.formatting import FastFormatter, detach_exc_info
 
 
 DEFAULT_LOG_FORMAT = '%(filename)-25s %(lineno)4d %(levelname)-8s %(message)s'
 DEFAULT_LOG_DATE_FORMAT = '%H:%M:%S'
+DEFAULT_LOG_SCOPE_LIMIT = 10000
+DEFAULT_LOG_STORE_MAX_AGE = 7  # days
+DEFAULT_LOG_PROFILE_TOP = 20
 
 
 def add_option_ini(parser, option, dest, default=None, **kwargs):
@@ -56,6 +61,35 @@ def pytest_addoption(parser):
         dest='log_date_format', default=DEFAULT_LOG_DATE_FORMAT,
         help='log date format as used by the logging module.'
     )
+    add_option_ini(
+        parser,
+        '--log-capture-level',
+        dest='log_capture_level', default=None,
+        help=('level of logs captured for each test (all by default); '
+              'the lower it is, the more records are created at all.')
+    )
+    add_option_ini(
+        parser,
+        '--log-flight-recorder',
+        dest='log_flight_recorder', default=0, type=int,
+        help=('only keep the last given number of captured records (not '
+              'formatted) until a record of --log-flight-trigger level '
+              'comes or the test fails.')
+    )
+    add_option_ini(
+        parser,
+        '--log-flight-trigger',
+        dest='log_flight_trigger', default=None,
+        help='level of records that make the flight recorder report logs.'
+    )
+    add_option_ini(
+        parser,
+        '--log-rerun-failed',
+        dest='log_rerun_failed', action='store_const', const=True,
+        default=False,
+        help=('run failed tests once again at the end of the session, '
+              'capturing logs at DEBUG level for the failure reports.')
+    )
     add_option_ini(
         parser,
         '--log-cli-level',
@@ -98,6 +132,107 @@ def pytest_addoption(parser):
         dest='log_file_date_format', default=DEFAULT_LOG_DATE_FORMAT,
         help='log date format as used by the logging module.'
     )
+    add_option_ini(
+        parser,
+        '--log-file-binary',
+        dest='log_file_binary', action='store_const', const=True,
+        default=False,
+        help=('write records to the log file in a compact binary form, '
+              'see "python -m pytest_catchlog.dump --help".')
+    )
+    add_option_ini(
+        parser,
+        '--log-db',
+        dest='log_db', default=None, metavar='PATH',
+        help=('store records of the session into an SQLite database, see '
+              'python -m pytest_catchlog.query.')
+    )
+    add_option_ini(
+        parser,
+        '--log-db-level',
+        dest='log_db_level', default=None,
+        help=('log database logging level (all records captured by '
+              'default, see --log-capture-level).')
+    )
+    add_option_ini(
+        parser,
+        '--log-db-fts',
+        dest='log_db_fts', action='store_const', const=True, default=False,
+        help='add a full-text index of messages to the log database.'
+    )
+    add_option_ini(
+        parser,
+        '--log-socket',
+        dest='log_socket', default=None, metavar='ADDRESS',
+        help=('send records of the session to a collector listening on '
+              'host:port or unix:/path.')
+    )
+    add_option_ini(
+        parser,
+        '--log-socket-level',
+        dest='log_socket_level', default=None,
+        help=('log socket logging level (all records captured by '
+              'default, see --log-capture-level).')
+    )
+    add_option_ini(
+        parser,
+        '--log-store',
+        dest='log_store', action='store_const', const=True, default=False,
+        help=('store captured logs of tests under the cache dir, '
+              'reports only refer to them by digest.')
+    )
+    add_option_ini(
+        parser,
+        '--log-store-max-age',
+        dest='log_store_max_age', default=DEFAULT_LOG_STORE_MAX_AGE,
+        type=float,
+        help=('days stored logs are kept since they were last used '
+              '(7 by default).')
+    )
+    add_option_ini(
+        parser,
+        '--log-benchmark-capture',
+        dest='log_benchmark_capture', action='store_const', const=True,
+        default=False,
+        help=('keep capturing logs within calls measured by pytest-benchmark '
+              '(records are only counted by default).')
+    )
+    add_option_ini(
+        parser,
+        '--log-profile',
+        dest='log_profile', default=0, type=int,
+        nargs='?', const=DEFAULT_LOG_PROFILE_TOP, metavar='TOP',
+        help=('show the logging call sites that cost the most in the '
+              'terminal summary ({0} by default).'.format(
+                  DEFAULT_LOG_PROFILE_TOP))
+    )
+    add_option_ini(
+        parser,
+        '--log-profile-file',
+        dest='log_profile_file', default=None,
+        help='write costs of all logging call sites into a JSON file.'
+    )
+    add_option_ini(
+        parser,
+        '--log-metrics',
+        dest='log_metrics', default=None, metavar='PATH',
+        help=('write numbers of records and bytes per logger, level and test '
+              'into a JSON file (or OpenMetrics text for *.prom files).')
+    )
+    add_option_ini(
+        parser,
+        '--log-overhead',
+        dest='log_overhead', action='store_const', const=True, default=False,
+        help=('show the time spent by the plugin itself around tests '
+              'in the terminal summary.')
+    )
+    add_option_ini(
+        parser,
+        '--log-scope-limit',
+        dest='log_scope_limit', default=DEFAULT_LOG_SCOPE_LIMIT, type=int,
+        help=('max number of records kept by caplog_module and '
+              'caplog_session (the oldest ones are dropped).')
+    )
 
 
 
@@ -106,11 +241,18 @@ def get_actual_log_level(config, setting_name):
     log_level = get_option_ini(config, setting_name)
     if not log_level:
         return
-    if isinstance(log_level, py.builtin.text):
+    return parse_log_level(log_level, setting_name)
+
+
+def parse_log_level(log_level, setting_name):
+    """Return the logging level number of a level name (or number)."""
+    if isinstance(log_level, int):
+        return log_level
+    if isinstance(log_level, py.builtin._basestring):
         log_level = log_level.upper()
     try:
         return int(getattr(logging, log_level, log_level))
-    except ValueError:
+    except (TypeError, ValueError):
         # Python logging does not recognise this as a logging level
         raise pytest.UsageError(
             "'{0}' is not recognized as a logging level name for "
@@ -120,10 +262,65 @@ def get_actual_log_level(config, setting_name):
                 setting_name))
 
 
-def pytest_configure(config):
-    """Always register the log catcher plugin with py.test or tests can't
-    find the  fixture function.
+def get_bool_option_ini(config, name):
+    value = get_option_ini(config, name)
+    if not isinstance(value, bool):
+        if value.lower() in ('true', 'yes', '1'):
+            value = True
+        elif value.lower() in ('false', 'no', '0'):
+            value = False
+    return value
+
+
+CatchLogOptions = namedtuple('CatchLogOptions', [
+    'print_logs',
+    'log_capture_level',
+    'log_flight_recorder',
+    'log_flight_trigger',
+    'log_rerun_failed',
+    'log_format',
+    'log_date_format',
+    'log_cli_level',
+    'log_cli_format',
+    'log_cli_date_format',
+    'log_file',
+    'log_file_level',
+    'log_file_format',
+    'log_file_date_format',
+    'log_file_binary',
+    'log_db',
+    'log_db_level',
+    'log_db_fts',
+    'log_socket',
+    'log_socket_level',
+    'log_store',
+    'log_store_max_age',
+    'log_benchmark_capture',
+    'log_profile',
+    'log_profile_file',
+    'log_metrics',
+    'log_overhead',
+    'log_scope_limit',
+])
+
+
+def resolve_options(config):
+    """Resolve all options of the plugin at once, falling back to defaults.
+
+    Each option is looked up exactly once, the result is immutable.
     """
+    log_format = get_option_ini(config, 'log_format')
+    log_date_format = get_option_ini(config, 'log_date_format')
+
+    log_capture_level = get_actual_log_level(config, 'log_capture_level')
+    if log_capture_level is None:
+        # Capture everything, regardless of what is printed to CLI or file
+        log_capture_level = logging.NOTSET
+
+    log_flight_trigger = get_actual_log_level(config, 'log_flight_trigger')
+    if log_flight_trigger is None:
+        log_flight_trigger = logging.ERROR
+
     log_cli_level = get_actual_log_level(config, 'log_cli_level')
     if log_cli_level is None:
         # No specific CLI logging level was provided, let's check
@@ -132,17 +329,205 @@ def pytest_configure(config):
         if log_cli_level is None:
             # No log_level was provided, default to WARNING
             log_cli_level = logging.WARNING
-    config._catchlog_log_cli_level = log_cli_level
-    config._catchlog_log_file = get_option_ini(config, 'log_file')
-    if config._catchlog_log_file:
+
+    log_file = get_option_ini(config, 'log_file')
+    log_file_level = None
+    if log_file:
         log_file_level = get_actual_log_level(config, 'log_file_level')
         if log_file_level is None:
             # No log_level was provided, default to WARNING
             log_file_level = logging.WARNING
-        config._catchlog_log_file_level = log_file_level
+
+    log_db = get_option_ini(config, 'log_db') or None
+    log_db_level = None
+    log_db_fts = get_bool_option_ini(config, 'log_db_fts')
+    if log_db:
+        log_db_level = get_actual_log_level(config, 'log_db_level')
+        if log_db_level is None:
+            # Store whatever tests would capture
+            log_db_level = log_capture_level
+        if log_db_fts:
+            from pytest_catchlog.logdb import check_fts
+            try:
+                check_fts()
+            except ValueError as e:
+                raise pytest.UsageError('--log-db-fts: {0}'.format(e))
+
+    log_socket = get_option_ini(config, 'log_socket') or None
+    log_socket_level = None
+    if log_socket:
+        from pytest_catchlog.socketlog import parse_address
+        try:
+            log_socket = parse_address(log_socket)
+        except ValueError as e:
+            raise pytest.UsageError('--log-socket: {0}'.format(e))
+        log_socket_level = get_actual_log_level(config, 'log_socket_level')
+        if log_socket_level is None:
+            # Send whatever tests would capture
+            log_socket_level = log_capture_level
+
+    return CatchLogOptions(
+        print_logs=get_bool_option_ini(config, 'log_print'),
+        log_capture_level=log_capture_level,
+        log_flight_recorder=int(get_option_ini(config, 'log_flight_recorder')),
+        log_flight_trigger=log_flight_trigger,
+        log_rerun_failed=get_bool_option_ini(config, 'log_rerun_failed'),
+        log_format=log_format,
+        log_date_format=log_date_format,
+        log_cli_level=log_cli_level,
+        # No CLI specific format was provided, use log_format
+        log_cli_format=(get_option_ini(config, 'log_cli_format') or
+                        log_format),
+        log_cli_date_format=(get_option_ini(config, 'log_cli_date_format') or
+                             log_date_format),
+        log_file=log_file,
+        log_file_level=log_file_level,
+        # No log file specific format was provided, use log_format
+        log_file_format=(get_option_ini(config, 'log_file_format') or
+                         log_format),
+        log_file_date_format=(get_option_ini(config, 'log_file_date_format') or
+                              log_date_format),
+        log_file_binary=get_bool_option_ini(config, 'log_file_binary'),
+        log_db=log_db,
+        log_db_level=log_db_level,
+        log_db_fts=log_db_fts,
+        log_socket=log_socket,  # (family, address)
+        log_socket_level=log_socket_level,
+        log_store=get_bool_option_ini(config, 'log_store'),
+        log_store_max_age=float(get_option_ini(config, 'log_store_max_age')),
+        log_benchmark_capture=get_bool_option_ini(config,
+                                                  'log_benchmark_capture'),
+        log_profile=int(get_option_ini(config, 'log_profile')),
+        log_profile_file=get_option_ini(config, 'log_profile_file') or None,
+        log_metrics=get_option_ini(config, 'log_metrics') or None,
+        log_overhead=get_bool_option_ini(config, 'log_overhead'),
+        log_scope_limit=int(get_option_ini(config, 'log_scope_limit')),
+    )
+
+
+CaptureSettings = namedtuple('CaptureSettings', [
+    'capture',  # whether to capture at all
+    'report',   # whether to add captured logs to the report
+    'level',
+    'limit',    # max number of records kept, or None
+    'recorder',  # size of the flight recorder buffer, or None
+])
+
+
+def marker_argument(item, marker, name):
+    """Return the single argument of the marker, given by position or name.
+    """
+    args = list(marker.args)
+    if name in marker.kwargs:
+        args.append(marker.kwargs[name])
+    if len(args) != 1:
+        raise pytest.UsageError(
+            '{0}: {1} expects exactly one argument ({2})'.format(
+                item.nodeid, marker.name, name))
+    return args[0]
+
+
+class PhaseOutcome(object):
+    """Lets runtest hookwrappers pass on the outcome of the wrapped hook."""
+
+    __slots__ = ('outcome',)
+
+    def __init__(self):
+        self.outcome = None
+
+    @property
+    def failed(self):
+        return getattr(self.outcome, 'excinfo', None) is not None
+
+
+def pytest_configure(config):
+    """Always register the log catcher plugin with py.test or tests can't
+    find the  fixture function.
+    """
+    config.addinivalue_line(
+        'markers',
+        'no_log_capture: do not capture logs of the test, unless it uses '
+        'the caplog fixture (and then do not report them anyway).')
+    config.addinivalue_line(
+        'markers',
+        'log_capture_level(level): capture logs of the test starting from '
+        'the given level, e.g. "WARNING", see --log-capture-level.')
+    config.addinivalue_line(
+        'markers',
+        'log_capture_limit(records): only keep the first given number of '
+        'log records of each phase of the test.')
+
     config.pluginmanager.register(CatchLogPlugin(config), '_catch_log')
 
 
+@pytest.yield_fixture
+def caplog(request):
+    """Access and control log capturing.
+
+    Captured logs are available through the following methods::
+
+    * caplog.text()          -> string containing formatted log output
+    * caplog.records()       -> list of logging.LogRecord instances
+    * caplog.record_tuples() -> list of (logger_name, level, message) tuples
+    """
+    # Deferred until a test actually asks for it.
+    from pytest_catchlog.fixture import CompatLogCaptureFixture
+
+    item = request.node
+    plugin = request.config.pluginmanager.getplugin('_catch_log')
+    if hasattr(item, 'catch_log_handler'):
+        # Possibly requested dynamically (request.getfuncargvalue()) by a
+        # test whose logs go to the flight recorder.
+        plugin._stop_recording(item)
+        yield CompatLogCaptureFixture(item)
+        return
+
+    # Requested dynamically by a test whose logs are not captured
+    # otherwise: capture them from now on.
+    with plugin._capturing_logs_on_demand(item):
+        yield CompatLogCaptureFixture(item)
+
+capturelog = caplog
+
+
+@contextmanager
+def scoped_caplog(request):
+    from pytest_catchlog.fixture import ScopedLogCaptureFixture
+
+    plugin = request.config.pluginmanager.getplugin('_catch_log')
+    handler = plugin.instrumented(
+        BoundedLogCaptureHandler(plugin.options.log_scope_limit))
+    with catching_logs(handler, formatter=plugin.formatter,
+                       level=plugin.options.log_capture_level):
+        plugin.scoped_handlers.append(handler)
+        try:
+            yield ScopedLogCaptureFixture(handler)
+        finally:
+            plugin.scoped_handlers.remove(handler)
+
+
+@pytest.yield_fixture(scope='module')
+def caplog_module(request):
+    """Access and control log capturing for the whole module.
+
+    Same as 'caplog', but keeps records (only the last --log-scope-limit
+    ones) for as long as the module runs, so that module-scoped fixtures
+    can check their logs.
+    """
+    with scoped_caplog(request) as fixture:
+        yield fixture
+
+
+@pytest.yield_fixture(scope='session')
+def caplog_session(request):
+    """Access and control log capturing for the whole session.
+
+    Same as 'caplog_module', but for session-scoped fixtures.
+    """
+    with scoped_caplog(request) as fixture:
+        yield fixture
+
+
 class CatchLogPlugin(object):
     """Attaches to the logging module and captures log messages for each test.
     """
@@ -150,106 +535,514 @@ class CatchLogPlugin(object):
     def __init__(self, config):
         """Creates a new plugin to capture log messages.
 
-        The formatter can be safely shared across all handlers so
+        Options are resolved right away (so that invalid ones are reported
+        early), but handlers and formatters are only created on first use.
+        """
+        self.options = resolve_options(config)
+        self.print_logs = self.options.print_logs
+        self.failed_reports = {}  # {'nodeid': [report, ...]}
+        self.rerunning = False
+        self.scoped_handlers = []  # of caplog_module and caplog_session
+
+        self.overhead = None
+        if self.options.log_overhead:
+            self._time_overhead()
+        if self.options.log_store and not hasattr(config, 'cache'):
+            raise pytest.UsageError('--log-store requires the cache provider '
+                                    'plugin (pytest>=2.8)')
+        self.config = config
+
+    @lazy_property
+    def formatter(self):
+        """The formatter can be safely shared across all handlers so
         create a single one for the entire test session here.
         """
-        print_logs = get_option_ini(config, 'log_print')
-        if not isinstance(print_logs, bool):
-            if print_logs.lower() in ('true', 'yes', '1'):
-                print_logs = True
-            elif print_logs.lower() in ('false', 'no', '0'):
-                print_logs = False
-        self.print_logs = print_logs
-        self.formatter = logging.Formatter(
-                get_option_ini(config, 'log_format'),
-                get_option_ini(config, 'log_date_format'))
-        self.log_cli_handler = logging.StreamHandler(sys.stderr)
-        log_cli_format = get_option_ini(config, 'log_cli_format')
-        if not log_cli_format:
-            # No CLI specific format was provided, use log_format
-            log_cli_format = get_option_ini(config, 'log_format')
-        log_cli_date_format = get_option_ini(config, 'log_cli_date_format')
-        if not log_cli_date_format:
-            # No CLI specific date format was provided, use log_date_format
-            log_cli_date_format = get_option_ini(config, 'log_date_format')
-        log_cli_formatter = logging.Formatter(
-                log_cli_format,
-                datefmt=log_cli_date_format)
-        self.log_cli_handler.setFormatter(log_cli_formatter)
-        if config._catchlog_log_file:
-            log_file_format = get_option_ini(config, 'log_file_format')
-            if not log_file_format:
-                # No log file specific format was provided, use log_format
-                log_file_format = get_option_ini(config, 'log_format')
-            log_file_date_format = get_option_ini(config, 'log_file_date_format')
-            if not log_file_date_format:
-                # No log file specific date format was provided, use log_date_format
-                log_file_date_format = get_option_ini(config, 'log_date_format')
-            self.log_file_handler = logging.FileHandler(
-                config._catchlog_log_file,
-                # Each pytest runtests session will write to a clean logfile
-                mode='w',
-            )
-            log_file_formatter = logging.Formatter(
-                    log_file_format,
-                    datefmt=log_file_date_format)
-            self.log_file_handler.setFormatter(log_file_formatter)
-        else:
-            self.log_file_handler = None
+        return FastFormatter(self.options.log_format,
+                             self.options.log_date_format)
+
+    def _time_overhead(self):
+        """Time the work around tests, excluding the tests themselves.
+
+        Hookwrappers are left intact, the context managers they use are
+        replaced by timed ones instead.  The work done on records emitted
+        by tests (formatting, capturing, writing) is timed per record by
+        handlers, see instrumented().
+        """
+        from pytest_catchlog.overhead import OverheadStats
+
+        overhead = self.overhead = OverheadStats()
+        runtest_for = self._runtest_for
+        session_logging = self._session_logging
+
+        self._runtest_for = lambda item, when: overhead.timing(
+            when, runtest_for(item, when))
+        self._session_logging = lambda: overhead.timing(
+            'runtestloop', session_logging())
+
+    @lazy_property
+    def profile(self):
+        if not (self.options.log_profile or self.options.log_profile_file):
+            return None
+        from pytest_catchlog.profile import LogProfile
+        return LogProfile()
+
+    @lazy_property
+    def metrics(self):
+        if not self.options.log_metrics:
+            return None
+        from pytest_catchlog.metrics import LogMetrics
+        return LogMetrics()
+
+    def instrumented(self, handler):
+        """Account the work of the handler to the profile, the metrics and
+        the overhead, if enabled (and not rerunning failed tests, counted
+        already).
+        """
+        if self.rerunning:
+            return handler
+        if self.profile is not None:
+            handler = self.profile.profiled(handler)
+        if self.metrics is not None:
+            handler = self.metrics.counted(handler)
+        if self.overhead is not None:
+            handler = self.overhead.timed_handler(handler)
+        return handler
+
+    @lazy_property
+    def log_cli_handler(self):
+        log_cli_handler = logging.StreamHandler(sys.stderr)
+        log_cli_handler.setFormatter(FastFormatter(
+                self.options.log_cli_format,
+                datefmt=self.options.log_cli_date_format))
+        return self.instrumented(log_cli_handler)
+
+    @lazy_property
+    def log_file_handler(self):
+        if not self.options.log_file:
+            return None
+        if self.options.log_file_binary:
+            from pytest_catchlog.binlog import BinaryLogHandler
+            return self.instrumented(BinaryLogHandler(self.options.log_file))
+        log_file_handler = logging.FileHandler(
+            self.options.log_file,
+            # Each pytest runtests session will write to a clean logfile
+            mode='w',
+            # ...but only once there is anything to write.
+            delay=True,
+        )
+        log_file_handler.setFormatter(FastFormatter(
+                self.options.log_file_format,
+                datefmt=self.options.log_file_date_format))
+        return self.instrumented(log_file_handler)
+
+    @lazy_property
+    def log_db_handler(self):
+        if not self.options.log_db:
+            return None
+        from pytest_catchlog.logdb import SQLiteLogHandler
+        return self.instrumented(SQLiteLogHandler(self.options.log_db,
+                                                  fts=self.options.log_db_fts))
+
+    @lazy_property
+    def log_socket_handler(self):
+        if not self.options.log_socket:
+            return None
+        from pytest_catchlog.socketlog import SocketLogHandler
+        return self.instrumented(SocketLogHandler(*self.options.log_socket))
+
+    @lazy_property
+    def _contextual(self):
+        """Handlers (and counters) keeping the test phase records are
+        emitted in.
+        """
+        return [obj for obj in (self.log_file_handler, self.log_db_handler,
+                                self.log_socket_handler, self.metrics)
+                if hasattr(obj, 'set_context')]
+
+    @lazy_property
+    def log_store(self):
+        if not self.options.log_store:
+            return None
+        from pytest_catchlog.store import LogStore
+        return LogStore(self.config.cache.makedir('catchlog'))
+
+    def _capture_settings(self, item):
+        """Resolve how to capture logs of the item, honoring its markers.
+
+        Done once per item, the result is reused for all of its phases.
+        """
+        try:
+            return item._catch_log_settings
+        except AttributeError:
+            pass
+
+        report = self.print_logs and not item.get_marker('no_log_capture')
+        fixturenames = getattr(item, 'fixturenames', ())
+        # Otherwise nobody is going to look at the records.
+        capture = (report or
+                   'caplog' in fixturenames or 'capturelog' in fixturenames)
+
+        level = self.options.log_capture_level
+        marker = item.get_marker('log_capture_level')
+        if marker is not None:
+            level = parse_log_level(
+                marker_argument(item, marker, 'level'),
+                '{0}: log_capture_level'.format(item.nodeid))
+
+        limit = None
+        marker = item.get_marker('log_capture_limit')
+        if marker is not None:
+            limit = marker_argument(item, marker, 'records')
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                raise pytest.UsageError(
+                    '{0}: log_capture_limit expects a number of records, '
+                    'got {1!r}'.format(item.nodeid, limit))
+
+        # Records must be at hand for caplog, it can't be recorded only.
+        recorder = None
+        if (report and self.options.log_flight_recorder > 0 and
+                'caplog' not in fixturenames and
+                'capturelog' not in fixturenames):
+            recorder = self.options.log_flight_recorder
+
+        settings = item._catch_log_settings = CaptureSettings(
+            capture, report, level, limit, recorder)
+        return settings
 
     @contextmanager
     def _runtest_for(self, item, when):
         """Implements the internals of pytest_runtest_xxx() hook."""
-        with catching_logs(LogCaptureHandler(),
-                           formatter=self.formatter) as log_handler:
+        contextual = self._contextual
+        for obj in contextual:
+            obj.set_context(item.nodeid, when)
+
+        settings = self._capture_settings(item)
+        phase = PhaseOutcome()
+        try:
+            with self._scoped_levels():
+                if settings.capture:
+                    with self._capturing_logs_for(item, when, settings,
+                                                  phase):
+                        yield phase  # run test
+                else:
+                    # Neither reported nor asked for through the fixture,
+                    # don't create records nobody is going to look at.
+                    yield phase  # run test
+        finally:
+            for obj in contextual:
+                obj.set_context()
+
+    @contextmanager
+    def _scoped_levels(self):
+        """Lower the root logger for handlers of scoped caplog fixtures.
+
+        Their levels outlive the phase which set them, so the root logger
+        is lowered again on each phase.
+        """
+        if not self.scoped_handlers:
+            yield
+            return
+        root_logger = logging.getLogger()
+        level = min([handler.level for handler in self.scoped_handlers] +
+                    [root_logger.level])
+        with logging_at_level(level, root_logger):
+            yield
+
+    @contextmanager
+    def _capturing_logs_for(self, item, when, settings, phase):
+        log_handler = self.instrumented(LogCaptureHandler(
+            settings.limit, settings.recorder,
+            self.options.log_flight_trigger))
+        with catching_logs(log_handler, formatter=self.formatter,
+                           level=settings.level):
             item.catch_log_handler = log_handler
             try:
-                yield  # run test
+                with self._benchmarking_for(item, when, log_handler):
+                    yield  # run test
             finally:
                 del item.catch_log_handler
 
-            if self.print_logs:
+            if phase.failed:
+                log_handler.promote()
+
+            if settings.report:
                 # Add a captured log section to the report.
                 log = log_handler.stream.getvalue().strip()
+                if log_handler.dropped:
+                    log = (log + '\n... {0} more records dropped, see '
+                           'log_capture_limit'.format(log_handler.dropped)
+                           ).strip()
+                if log_handler.suppressed:
+                    log = (log + '\n... {0} records suppressed while '
+                           'benchmarking'.format(log_handler.suppressed)
+                           ).strip()
+                if log and self.log_store is not None:
+                    log = self.log_store.reference(self.log_store.put(log))
                 item.add_report_section(when, 'log', log)
 
+    def _stop_recording(self, item):
+        """Capture all records of the item, for caplog to see them."""
+        settings = self._capture_settings(item)
+        if settings.recorder is not None:
+            item._catch_log_settings = settings._replace(recorder=None)
+            item.catch_log_handler.stop_recording()
+
+    @contextmanager
+    def _capturing_logs_on_demand(self, item):
+        """Capture logs of the item for caplog only, without reporting."""
+        settings = self._capture_settings(item)
+        log_handler = self.instrumented(LogCaptureHandler(settings.limit))
+        with catching_logs(log_handler, formatter=self.formatter,
+                           level=settings.level):
+            item.catch_log_handler = log_handler
+            try:
+                yield
+            finally:
+                del item.catch_log_handler
+
+    @contextmanager
+    def _benchmarking_for(self, item, when, log_handler):
+        """Suppress records within calls measured by pytest-benchmark."""
+        benchmark = getattr(item, 'funcargs', {}).get('benchmark')
+        if (when != 'call' or benchmark is None or
+                self.options.log_benchmark_capture):
+            yield
+            return
+
+        from pytest_catchlog.benchmarking import suppressing_in_benchmark
+        with suppressing_in_benchmark(benchmark, log_handler):
+            yield
+
     @pytest.mark.hookwrapper
     def pytest_runtest_setup(self, item):
-        with self._runtest_for(item, 'setup'):
-            yield
+        with self._runtest_for(item, 'setup') as phase:
+            phase.outcome = yield
 
     @pytest.mark.hookwrapper
     def pytest_runtest_call(self, item):
-        with self._runtest_for(item, 'call'):
-            yield
+        with self._runtest_for(item, 'call') as phase:
+            phase.outcome = yield
 
     @pytest.mark.hookwrapper
     def pytest_runtest_teardown(self, item):
-        with self._runtest_for(item, 'teardown'):
-            yield
+        with self._runtest_for(item, 'teardown') as phase:
+            phase.outcome = yield
+
+    def pytest_sessionfinish(self, session):
+        # Workers of pytest-xdist leave it to the master.
+        if (self.options.log_store and
+                not session.config.option.collectonly and
+                not hasattr(session.config, 'slaveinput')):
+            self.log_store.prune(self.options.log_store_max_age * 86400)
 
     @pytest.mark.hookwrapper
     def pytest_runtestloop(self, session):
         """Runs all collected test items."""
+        if session.config.option.collectonly:
+            yield  # nothing is going to run, don't bother with handlers
+            return
+
+        with self._session_logging():
+            outcome = yield  # run all the tests
+
+        # Out of the session handlers, not to log the same records twice.
+        if self.failed_reports and getattr(outcome, 'excinfo', None) is None:
+            self._rerun_failed(session)
+
+    @contextmanager
+    def _session_logging(self):
         with catching_logs(self.log_cli_handler,
-                           level=session.config._catchlog_log_cli_level):
-            if self.log_file_handler is not None:
-                with catching_logs(self.log_file_handler,
-                                   level=session.config._catchlog_log_file_level):
-                    yield  # run all the tests
-            else:
-                yield  # run all the tests
+                           level=self.options.log_cli_level):
+            with catching_logs_if(self.log_file_handler,
+                                  level=self.options.log_file_level):
+                with catching_logs_if(self.log_db_handler,
+                                      level=self.options.log_db_level):
+                    with catching_logs_if(self.log_socket_handler,
+                                          level=self.options.log_socket_level):
+                        yield
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.overhead is not None:
+            self.overhead.write_summary(terminalreporter, [
+                'setup', 'call', 'teardown', 'runtestloop', 'records'])
+        # Not created at all under --collect-only.
+        log_socket_handler = self.__dict__.get('log_socket_handler')
+        if log_socket_handler is not None and log_socket_handler.dropped:
+            terminalreporter.write_line(
+                'log socket: {0} records dropped, the collector could not '
+                'keep up'.format(log_socket_handler.dropped))
+        if self.metrics is not None:
+            self.metrics.write(self.options.log_metrics)
+            terminalreporter.write_line('log metrics: written into {0}'.format(
+                self.options.log_metrics))
+        if self.profile is None:
+            return
+        if self.options.log_profile:
+            self.profile.write_summary(terminalreporter,
+                                       self.options.log_profile)
+        if self.options.log_profile_file:
+            self.profile.write_json(self.options.log_profile_file)
+            terminalreporter.write_line('log profile: written into {0}'.format(
+                self.options.log_profile_file))
+
+    def pytest_runtest_logreport(self, report):
+        if report.failed and self.options.log_rerun_failed:
+            self.failed_reports.setdefault(report.nodeid, []).append(report)
+
+    def _rerun_failed(self, session):
+        """Run failed tests once again capturing all logs at DEBUG level.
+
+        Captured logs of the run are attached to the original reports of
+        the failure.
+        """
+        from _pytest.runner import runtestprotocol
+
+        items = [item for item in session.items
+                 if self.failed_reports.get(item.nodeid)]
+        self.rerunning = True
+        try:
+            for i, item in enumerate(items):
+                item._catch_log_settings = self._capture_settings(
+                    item)._replace(capture=True, report=True,
+                                   level=logging.DEBUG, recorder=None)
+                item._report_sections = []
+                # Fixtures shared with the next one to rerun are kept.
+                nextitem = items[i + 1] if i + 1 < len(items) else None
+                # Not logged: the test has been counted already.
+                rerun_reports = runtestprotocol(item, log=False,
+                                                nextitem=nextitem)
+
+                # Sections of all the phases end up in the last report.
+                self.failed_reports[item.nodeid][0].sections.extend(
+                    (name + ' (rerun at DEBUG)', content)
+                    for name, content in rerun_reports[-1].sections
+                    if name.startswith('Captured log') and content)
+        finally:
+            self.rerunning = False
+
+
+@contextmanager
+def catching_logs_if(handler, level):
+    """Like catching_logs(), doing nothing if the handler is None."""
+    if handler is None:
+        yield
+    else:
+        with catching_logs(handler, level=level):
+            yield
+
+
+# Used to render tracebacks by handlers having no formatter set.
+_formatter = FastFormatter()
+
+
+class LogTextBuffer(object):
+    """A text stream keeping the chunks written to it in a list.
+
+    The chunks are joined on demand and the result is kept until anything
+    else is written, so that reading the text over and over again doesn't
+    copy it each time.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.line_starts = []  # the number of lines before each chunk
+        self.line_count = 0
+        self.cleared = 0  # the number of truncate() calls
+        self._value = u''
+        self._joined = 0  # the number of chunks in self._value
+
+    def truncate(self):
+        """Discard all the text written so far."""
+
+        del self.chunks[:]
+        del self.line_starts[:]
+        self.line_count = 0
+        self.cleared += 1
+        self._value = u''
+        self._joined = 0
+
+    def write(self, data):
+        if not isinstance(data, py.builtin.text):
+            data = py.builtin.text(data, 'utf-8', 'replace')
+        self.chunks.append(data)
+        self.line_starts.append(self.line_count)
+        self.line_count += data.count(u'\n')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        """Return the whole text written so far."""
+
+        if self._joined != len(self.chunks):
+            self._value += u''.join(self.chunks[self._joined:])
+            self._joined = len(self.chunks)
+        return self._value
+
+    def text_since(self, offset):
+        """Return the text written after the first 'offset' chunks."""
+
+        if not offset:
+            return self.getvalue()
+        return u''.join(self.chunks[offset:])
+
+    def iter_lines(self, since=0):
+        """Iterate over the lines of text, skipping the first 'since' ones.
+
+        Only the chunks having the lines asked for are looked at.
+        """
+        # The last chunk started before the line, it ends the previous one.
+        first = max(bisect_left(self.line_starts, since) - 1, 0)
+        if first >= len(self.chunks):
+            return iter(())
+        lines = u''.join(self.chunks[first:]).split(u'\n')
+        if not lines[-1]:
+            lines.pop()
+        return islice(lines, max(since - self.line_starts[first], 0), None)
 
 
 class LogCaptureHandler(logging.StreamHandler):
     """A logging handler that stores log records and the log text."""
 
-    def __init__(self):
-        """Creates a new log handler."""
+    def __init__(self, limit=None, recorder=None, trigger=logging.ERROR):
+        """Creates a new log handler.
+
+        Only the first 'limit' records are kept (if given), the rest are
+        just counted.
+
+        If a 'recorder' size is given, the handler works as a flight
+        recorder: only the last 'recorder' records are kept, unformatted,
+        until a record of the 'trigger' level (or above) comes, or
+        promote() is called (e.g. because the test has failed).
+        """
 
         logging.StreamHandler.__init__(self)
-        self.stream = py.io.TextIO()
+        self.stream = LogTextBuffer()
         self.records = []
+        self.limit = limit
+        self.dropped = 0
+        self.suppressing = False
+        self.suppressed = 0
+        self.recorder_size = recorder
+        self.recorder = None
+        if recorder is not None:
+            self.recorder = deque(maxlen=recorder)
+        self.trigger = trigger
+
+    @contextmanager
+    def suppressing_records(self):
+        """Only count records instead of keeping them."""
+
+        self.suppressing = True
+        try:
+            yield
+        finally:
+            self.suppressing = False
 
     def close(self):
         """Close this log handler and its underlying stream."""
@@ -260,5 +1053,72 @@ class LogCaptureHandler(logging.StreamHandler):
     def emit(self, record):
         """Keep the log records in a list in addition to the log text."""
 
+        if self.suppressing:
+            self.suppressed += 1
+            return
+        if self.recorder is not None:
+            if record.levelno < self.trigger:
+                self.recorder.append(record)
+                return
+            self.promote()
+        self.capture(record)
+
+    def promote(self):
+        """Capture records kept by the flight recorder so far."""
+
+        recorder = self.recorder
+        if recorder:
+            self.recorder = deque(maxlen=self.recorder_size)
+            for record in recorder:
+                self.capture(record)
+
+    def stop_recording(self):
+        """Promote records kept so far, and capture all of them from now on.
+        """
+
+        self.promote()
+        self.recorder = None
+
+    def capture(self, record):
+        """Keep the log record and its formatted text."""
+
+        if self.limit is not None and len(self.records) >= self.limit:
+            self.dropped += 1
+            return
+        if record.exc_info:
+            record = detach_exc_info(record, self.formatter or _formatter)
         self.records.append(record)
         logging.StreamHandler.emit(self, record)
+
+
+class BoundedLogCaptureHandler(logging.Handler):
+    """A logging handler that stores a limited number of last log records.
+
+    Unlike LogCaptureHandler, records are only formatted when the log text
+    is asked for.
+    """
+
+    def __init__(self, capacity):
+        """Creates a new log handler."""
+
+        logging.Handler.__init__(self)
+        self.capacity = capacity
+        self.records = deque(maxlen=capacity)
+        self.dropped = 0
+        self.cleared = 0
+
+    def emit(self, record):
+        """Keep the log record, dropping the oldest one if full."""
+
+        if record.exc_info:
+            record = detach_exc_info(record, self.formatter or _formatter)
+        if len(self.records) == self.capacity:
+            self.dropped += 1
+        self.records.append(record)
+
+    def getvalue(self, records=None):
+        """Return the log text of the records kept (or the ones given)."""
+
+        if records is None:
+            records = self.records
+        return ''.join(self.format(record) + '\n' for record in records)
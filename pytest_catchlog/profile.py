@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Profiling of logging call sites, as seen by the plugin's handlers."""
+from __future__ import absolute_import, division, print_function
+
+import io
+import json
+import os.path
+from timeit import default_timer
+
+from pytest_catchlog.formatting import FormattedSizes
+
+
+class CallSiteStats(object):
+    """Aggregated cost of records emitted by a single logging call site."""
+
+    __slots__ = ('pathname', 'lineno', 'name', 'levelname',
+                 'count', 'bytes', 'seconds')
+
+    def __init__(self, record):
+        self.pathname = record.pathname
+        self.lineno = record.lineno
+        self.name = record.name
+        self.levelname = record.levelname
+        self.count = self.bytes = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return dict((attr, getattr(self, attr)) for attr in self.__slots__)
+
+
+class LogProfile(object):
+    """Counts records, formatted bytes and the time spent in handlers,
+    per (pathname, lineno, logger, level).
+    """
+
+    def __init__(self):
+        self.sites = {}  # {(pathname, lineno, name, levelno): CallSiteStats}
+        self.sizes = FormattedSizes()
+
+    def profiled(self, handler):
+        """Make the handler account its work to this profile."""
+
+        handle = handler.handle
+        add = self.add
+
+        def profiled_handle(record):
+            start = default_timer()
+            try:
+                return handle(record)
+            finally:
+                add(record, default_timer() - start)
+
+        handler.handle = profiled_handle
+        return handler
+
+    def add(self, record, seconds):
+        key = (record.pathname, record.lineno, record.name, record.levelno)
+        site = self.sites.get(key)
+        if site is None:
+            site = self.sites[key] = CallSiteStats(record)
+
+        new, growth = self.sizes.add(record)
+        if new:
+            site.count += 1
+        site.bytes += growth
+        site.seconds += seconds
+
+    def top(self, count=None):
+        """Return call sites sorted by the time spent, the costliest first."""
+
+        sites = sorted(self.sites.values(),
+                       key=lambda site: (site.seconds, site.count),
+                       reverse=True)
+        return sites[:count] if count else sites
+
+    def write_summary(self, terminalreporter, count):
+        sites = self.top(count)
+        terminalreporter.write_sep(
+            '-', 'log profile: top {0} of {1} call sites'.format(
+                len(sites), len(self.sites)))
+        terminalreporter.write_line(
+            '{0:>9} {1:>10} {2:>10}  {3:<8} {4}'.format(
+                'records', 'KiB', 'ms', 'level', 'logger / call site'))
+        for site in sites:
+            terminalreporter.write_line(
+                '{0:>9} {1:>10.1f} {2:>10.2f}  {3:<8} {4} {5}:{6}'.format(
+                    site.count, site.bytes / 1024, site.seconds * 1000,
+                    site.levelname, site.name,
+                    shorten_path(site.pathname), site.lineno))
+
+    def write_json(self, filename):
+        data = json.dumps([site.as_dict() for site in self.top()], indent=2)
+        with io.open(filename, 'w', encoding='utf-8') as fh:
+            fh.write(data if isinstance(data, type(u'')) else
+                     data.decode('utf-8'))
+
+
+def shorten_path(pathname):
+    try:
+        relpath = os.path.relpath(pathname)
+    except ValueError:  # another drive on Windows
+        return pathname
+    return relpath if len(relpath) < len(pathname) else pathname
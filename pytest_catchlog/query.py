@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Query a log database written by 'py.test --log-db'.
+
+Usage::
+
+    python -m pytest_catchlog.query pytest.sqlite --nodeid test_foo.py::test
+"""
+from __future__ import absolute_import, division, print_function
+
+import logging
+import optparse
+import sqlite3
+import sys
+from contextlib import closing
+
+from pytest_catchlog.dump import (DEFAULT_DUMP_FORMAT,
+                                  DEFAULT_DUMP_DATE_FORMAT, Option,
+                                  parse_args)
+from pytest_catchlog.formatting import FastFormatter
+from pytest_catchlog.logdb import query
+
+
+def make_parser():
+    parser = optparse.OptionParser(
+        prog='python -m pytest_catchlog.query',
+        usage='%prog [options] LOG_DB',
+        description='Query a log database written with --log-db.',
+        option_class=Option)
+    parser.add_option(
+        '--nodeid', action='append',
+        help=('only show records of the test with this node id, or of its '
+              'parametrized variants (may be repeated).'))
+    parser.add_option(
+        '--nodeid-prefix', action='store_true', default=False,
+        help='match node ids by prefix, e.g. all tests of a module.')
+    parser.add_option(
+        '--phase', type='choice', choices=['setup', 'call', 'teardown'],
+        help='only show records of this test phase.')
+    parser.add_option(
+        '--level', type='level', default=logging.NOTSET,
+        help='only show records of this level or above.')
+    parser.add_option(
+        '--logger', action='append',
+        help='only show records of this logger or its children.')
+    parser.add_option(
+        '--grep',
+        help=('only show records whose message contains this text (a '
+              'full-text query if the database was written with '
+              '--log-db-fts).'))
+    parser.add_option(
+        '--format', default=DEFAULT_DUMP_FORMAT,
+        help=('log format as used by the logging module, %(nodeid)s and '
+              '%(phase)s are also available.'))
+    parser.add_option(
+        '--date-format', default=DEFAULT_DUMP_DATE_FORMAT,
+        help='log date format as used by the logging module.')
+    return parser
+
+
+def main(args=None, out=None):
+    options, log_db = parse_args(make_parser(), args, 'LOG_DB')
+    out = out or sys.stdout
+    formatter = FastFormatter(options.format, options.date_format)
+
+    with closing(sqlite3.connect(log_db)) as connection:
+        for record in query(connection,
+                            nodeids=options.nodeid or (),
+                            phase=options.phase,
+                            level=options.level,
+                            loggers=options.logger or (),
+                            grep=options.grep,
+                            nodeid_prefix=options.nodeid_prefix):
+            out.write(formatter.format(record) + '\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Shipping of session logs to a collector listening on a socket.
+
+Records are sent in batches over a persistent connection, each batch being
+a 4 bytes (big-endian) length followed by a JSON array of records encoded
+in UTF-8.  A record is an object having the RECORD_FIELDS keys.
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import logging
+import socket
+import struct
+import threading
+from collections import deque
+
+from pytest_catchlog.formatting import FastFormatter
+
+
+DEFAULT_QUEUE_SIZE = 10000  # records
+DEFAULT_BATCH_SIZE = 500  # records
+DEFAULT_SEND_INTERVAL = 0.2  # seconds
+DEFAULT_TIMEOUT = 5.0  # seconds
+
+LENGTH = struct.Struct('>I')
+
+RECORD_FIELDS = ('nodeid', 'phase', 'created', 'name', 'levelno',
+                 'levelname', 'pathname', 'lineno', 'message', 'exc_text')
+
+_formatter = FastFormatter()
+
+
+def parse_address(address):
+    """Parse 'host:port', '[ipv6]:port' or 'unix:/path' into (family,
+    address), resolving the host.
+
+    Raises ValueError for anything else.
+    """
+    if address.startswith('unix:'):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError('Unix sockets are not supported on this '
+                             'platform')
+        return socket.AF_UNIX, address[len('unix:'):]
+
+    host, sep, port = address.rpartition(':')
+    if host.startswith('[') and host.endswith(']'):
+        host = host[1:-1]
+    elif ':' in host:
+        host = ''  # IPv6 addresses need brackets
+    if not (sep and host and port.isdigit()):
+        raise ValueError("'{0}' is neither 'host:port' nor "
+                         "'unix:/path'".format(address))
+    try:
+        infos = socket.getaddrinfo(host, int(port), 0, socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError("can't resolve '{0}': {1}".format(host, e.args[-1]))
+    family, _, _, _, sockaddr = infos[0]
+    return family, sockaddr
+
+
+def _encodable(value):
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError, UnicodeError):
+        return repr(value)
+    return value
+
+
+def encode_record(row):
+    record = dict(zip(RECORD_FIELDS, row))
+    try:
+        return json.dumps(record)
+    except (TypeError, ValueError, UnicodeError):
+        # E.g. undecodable bytes on Python 2, sent as their repr rather
+        # than failing the whole batch.
+        return json.dumps(dict((key, _encodable(value))
+                               for key, value in record.items()))
+
+
+def encode_batch(rows):
+    data = '[' + ', '.join([encode_record(row) for row in rows]) + ']'
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return LENGTH.pack(len(data)) + data
+
+
+class SocketLogHandler(logging.Handler):
+    """A logging handler that sends records to a socket.
+
+    On the calling thread records are only appended to a bounded queue (the
+    oldest ones are dropped when the collector can't keep up), a background
+    thread sends them in batches, connecting (again) as needed.
+    """
+
+    def __init__(self, family, address, queue_size=DEFAULT_QUEUE_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 interval=DEFAULT_SEND_INTERVAL, timeout=DEFAULT_TIMEOUT):
+        """Creates a new log handler, and starts its sender thread."""
+
+        logging.Handler.__init__(self)
+        self.family = family
+        self.address = address
+        self.queue_size = queue_size  # deque.maxlen is Python 2.7+
+        self.queue = deque(maxlen=queue_size)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.timeout = timeout
+        self.dropped = 0
+        self.nodeid = self.phase = None
+
+        self.sock = None
+        self._batch = None  # (payload, number of records) not sent yet
+        self._closing = threading.Event()
+        self._sender = threading.Thread(target=self._send_loop,
+                                        name='catchlog-socket-sender')
+        self._sender.daemon = True
+        self._sender.start()
+
+    def set_context(self, nodeid=None, phase=None):
+        """Set the test node id and phase sent along with records."""
+
+        self.nodeid, self.phase = nodeid, phase
+
+    def emit(self, record):
+        """Queue the record to be sent."""
+
+        try:
+            if record.exc_info and not record.exc_text:
+                record.exc_text = _formatter.formatException(record.exc_info)
+            if len(self.queue) == self.queue_size:
+                self.dropped += 1  # the oldest one goes
+            self.queue.append((
+                self.nodeid, self.phase, record.created, record.name,
+                record.levelno, record.levelname, record.pathname,
+                record.lineno, record.getMessage(), record.exc_text))
+        except Exception:
+            self.handleError(record)
+
+    def _connect(self):
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def _disconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _send_loop(self):
+        closing = False
+        while not closing:
+            self._closing.wait(self.interval)
+            closing = self._closing.is_set()
+            try:
+                self._send_pending()
+            except (socket.error, EnvironmentError):
+                # Retried on a new connection next time, records keep
+                # queuing up meanwhile.
+                self._disconnect()
+            except Exception:
+                # Whatever goes wrong, the thread keeps sending later
+                # records, the batch at fault is dropped.
+                if self._batch is not None:
+                    self.dropped += self._batch[1]
+                    self._batch = None
+        self._disconnect()
+
+    def _send_pending(self):
+        queue = self.queue
+        while self._batch is not None or queue:
+            if self._batch is None:
+                rows = []
+                while queue and len(rows) < self.batch_size:
+                    rows.append(queue.popleft())
+                try:
+                    self._batch = (encode_batch(rows), len(rows))
+                except Exception:
+                    self.dropped += len(rows)
+                    raise
+
+            if self.sock is None:
+                self.sock = self._connect()
+            self.sock.sendall(self._batch[0])
+            self._batch = None
+
+    def close(self):
+        """Send the remaining records and stop the sender thread.
+
+        Records which couldn't be sent by then are counted as dropped.
+        """
+        self._closing.set()
+        if self._sender.is_alive():
+            self._sender.join()
+        self.dropped += len(self.queue)
+        self.queue.clear()
+        if self._batch is not None:
+            self.dropped += self._batch[1]
+            self._batch = None
+        logging.Handler.close(self)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed storage of captured logs.
+
+Each log is written once into a file named after its digest, so that
+reports only need to carry a short reference, and identical logs (e.g. of
+parametrized tests) are stored just once.  Logs not used for a while are
+pruned.
+"""
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import os
+import time
+
+import py
+
+
+DIGEST_NAME = 'sha1'
+
+
+class LogStore(object):
+    """Stores logs under a directory, each one in a file named by digest."""
+
+    def __init__(self, directory):
+        self.directory = py.path.local(directory)
+        self.known = set()  # digests already in the store
+
+    def path_for(self, digest):
+        return self.directory.join(digest + '.log')
+
+    def put(self, text):
+        """Store the log text (unless already there), return its digest."""
+
+        data = text.encode('utf-8')
+        digest = hashlib.new(DIGEST_NAME, data).hexdigest()
+        if digest not in self.known:
+            path = self.path_for(digest)
+            if path.check():
+                try:
+                    os.utime(str(path), None)  # in use, not to be pruned
+                except OSError:  # pruned meanwhile
+                    pass
+            if not path.check():
+                # Concurrent writers (e.g. xdist) write the same content.
+                tmp_path = path.new(basename='{0}.{1}.tmp'.format(
+                    path.basename, os.getpid()))
+                tmp_path.write_binary(data)
+                try:
+                    os.rename(str(tmp_path), str(path))
+                except OSError:  # already there on Windows
+                    tmp_path.remove()
+            self.known.add(digest)
+        return digest
+
+    def get(self, digest):
+        """Return the log text stored under the digest."""
+
+        return self.path_for(digest).read_binary().decode('utf-8')
+
+    def prune(self, max_age):
+        """Remove logs neither written nor reused for max_age seconds."""
+
+        before = time.time() - max_age
+        for path in self.directory.listdir('*.log'):
+            try:
+                if path.mtime() < before:
+                    path.remove()
+            except py.error.ENOENT:  # removed concurrently
+                pass
+
+    def reference(self, digest):
+        """A short reference to a stored log, to be put into reports."""
+
+        return '{0}:{1} {2}'.format(DIGEST_NAME, digest, self.path_for(digest))
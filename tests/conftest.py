@@ -15,11 +15,45 @@ def pytest_addoption(parser):
         help='Run performance tests (can be slow)',
     )
 
+    parser.addoption('--perf-parallel',
+        action='store_true', dest='perf_parallel', default=False,
+        help=('Run performance tests of all modes concurrently, '
+              'each pinned to its own CPU core (if there are enough)'),
+    )
+    parser.addoption('--perf-repeat',
+        action='store', dest='perf_repeat', type=int, default=1,
+        help=('Number of --perf-parallel repetitions, with modes rotated '
+              'across cores on each one to cancel out drift'),
+    )
+
+    parser.addoption('--perf-memory-size',
+        action='store', dest='perf_memory_size', type=int, default=None,
+        help=('Number of tests in the synthetic session traced by memory '
+              'benchmarks (default: 10000, or 10 with --run-perf=check)'),
+    )
+    parser.addoption('--perf-memory-logs',
+        action='store', dest='perf_memory_logs', type=int, default=None,
+        help='Number of log records per test in that synthetic session',
+    )
+
     parser.addoption('--perf-graph',
         action='store', dest='perf_graph_name',
         nargs='?', default=None, const='graph.svg',
         help='Plot a graph using data found in --benchmark-storage',
     )
+    parser.addoption('--perf-graph-title',
+        action='store', dest='perf_graph_title',
+        default='Speed in seconds',
+        help=('Title of the graph, e.g. "Memory in bytes" when plotting '
+              'peak_bytes or retained_bytes of memory benchmarks'),
+    )
+    parser.addoption('--perf-report',
+        action='store', dest='perf_report_name',
+        nargs='?', default=None, const='report.html',
+        help=('Write a self-contained HTML report of overheads of all '
+              'benchmarks relative to the "off" mode, using data found '
+              'in --benchmark-storage'),
+    )
     parser.addoption('--perf-expr',
         action='store', dest='perf_expr_primary',
         default='log_emit',
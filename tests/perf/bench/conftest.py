@@ -1,5 +1,7 @@
 from __future__ import absolute_import, division, print_function
 
+import logging
+
 import pytest
 
 
@@ -11,7 +13,66 @@ class CatchLogStub(object):
         yield
 
 
+def pytest_addoption(parser):
+    group = parser.getgroup('perf-memory', 'Memory benchmarks')
+    group.addoption('--memory-session-size',
+        action='store', dest='memory_session_size', type=int, default=10000,
+        help='Number of tests in a synthetic session to trace memory of',
+    )
+    group.addoption('--memory-session-logs',
+        action='store', dest='memory_session_logs', type=int, default=10,
+        help='Number of log records emitted by each test of that session',
+    )
+
+
 @pytest.mark.trylast
 def pytest_configure(config):
     if not pytest.config.pluginmanager.hasplugin('pytest_catchlog'):
         config.pluginmanager.register(CatchLogStub(), 'caplog_stub')
+
+
+# {'nodeid': {'key': value}}, see the 'extra_info' fixture.
+EXTRA_INFO = {}
+
+
+@pytest.fixture
+def extra_info(request):
+    """Extra values to store along with benchmark results of the test.
+
+    Mimics 'benchmark.extra_info' of newer pytest-benchmark versions.
+    """
+    return EXTRA_INFO.setdefault(request.node.nodeid, {})
+
+
+def pytest_benchmark_update_json(config, benchmarks, output_json):
+    for bench in output_json['benchmarks']:
+        info = EXTRA_INFO.get(bench['fullname'])
+        if info:
+            bench.setdefault('extra_info', {}).update(info)
+
+
+@pytest.fixture
+def nested_mode_args(pytestconfig):
+    """Reproduce the run mode of this session for a nested one."""
+    plugin = pytestconfig.pluginmanager.getplugin('_catch_log')
+    args = []
+    if plugin is None:
+        args += ['-p', 'no:pytest_catchlog']
+    elif not plugin.print_logs:
+        args.append('--no-print-logs')
+    if pytestconfig.getoption('capture') == 'no':
+        args.append('-s')
+    return args
+
+
+@pytest.yield_fixture
+def detached_root_logger():
+    """Keep records of a nested session away from handlers of this one."""
+    root_logger = logging.getLogger()
+    handlers, level = root_logger.handlers[:], root_logger.level
+    for handler in handlers:
+        root_logger.removeHandler(handler)
+    yield
+    for handler in handlers:
+        root_logger.addHandler(handler)
+    root_logger.setLevel(level)
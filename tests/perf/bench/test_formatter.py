@@ -0,0 +1,32 @@
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+import pytest
+
+from pytest_catchlog.formatting import FastFormatter
+from pytest_catchlog.plugin import DEFAULT_LOG_FORMAT, DEFAULT_LOG_DATE_FORMAT
+
+
+TIME_LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+
+formatter_classes = {
+    'stdlib': logging.Formatter,
+    'fast': FastFormatter,
+}
+
+
+@pytest.fixture
+def record():
+    return logging.LogRecord('pytest_catchlog.test.perf', logging.INFO,
+                             __file__, 42, 'Testing %s performance: %s',
+                             ('catchlog', 'format a single log record'), None)
+
+
+@pytest.mark.parametrize('impl', sorted(formatter_classes))
+@pytest.mark.parametrize('fmt', [DEFAULT_LOG_FORMAT, TIME_LOG_FORMAT],
+                         ids=['default', 'asctime'])
+def test_format(benchmark, record, impl, fmt):
+    formatter = formatter_classes[impl](fmt, DEFAULT_LOG_DATE_FORMAT)
+    benchmark.group = 'format'
+    benchmark(formatter.format, record)
@@ -0,0 +1,73 @@
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+import pytest
+
+
+RUNTEST_PHASES = ['setup', 'call', 'teardown']
+
+
+class ItemStub(object):
+    """Stands in for a test item, so that the real one is left untouched."""
+
+    def add_report_section(self, when, key, content):
+        pass
+
+    def get_marker(self, name):
+        return None
+
+
+def stub_hookwrapper(*args):
+    """No-op hookwrapper used when the plugin is off."""
+    yield
+
+
+def run_hookwrapper(hookwrapper, *args):
+    gen = hookwrapper(*args)
+    next(gen)  # up to the point where the wrapped hook would be called
+    for _ in gen:  # the rest, after a no-op wrapped hook
+        pass
+
+
+@pytest.fixture
+def catchlog_plugin(pytestconfig):
+    return pytestconfig.pluginmanager.getplugin('_catch_log')
+
+
+@pytest.yield_fixture
+def detached_session_handlers(catchlog_plugin):
+    """Temporarily remove handlers installed by the outer pytest_runtestloop.
+
+    Otherwise benchmarking the hookwrapper would only measure its cheap
+    reentrancy path.
+    """
+    root_logger = logging.getLogger()
+    handlers = []
+    if catchlog_plugin is not None:
+        handlers = [h for h in (catchlog_plugin.log_cli_handler,
+                                catchlog_plugin.log_file_handler)
+                    if h in root_logger.handlers]
+
+    for handler in handlers:
+        root_logger.removeHandler(handler)
+    yield
+    for handler in handlers:
+        root_logger.addHandler(handler)
+
+
+@pytest.mark.parametrize('phase', RUNTEST_PHASES)
+def test_hookwrapper(benchmark, catchlog_plugin, phase):
+    hookwrapper = getattr(catchlog_plugin, 'pytest_runtest_' + phase,
+                          stub_hookwrapper)
+    benchmark.group = 'hookwrapper'
+    benchmark(run_hookwrapper, hookwrapper, ItemStub())
+
+
+@pytest.mark.parametrize('phase', ['runtestloop'])
+def test_session_hookwrapper(benchmark, request, catchlog_plugin,
+                             detached_session_handlers, phase):
+    hookwrapper = getattr(catchlog_plugin, 'pytest_' + phase,
+                          stub_hookwrapper)
+    benchmark.group = 'hookwrapper'
+    benchmark(run_hookwrapper, hookwrapper, request.session)
@@ -2,10 +2,36 @@ from __future__ import absolute_import, division, print_function
 
 import logging
 
+import pytest
+
+from pytest_catchlog.common import catching_logs, logging_at_level
+from pytest_catchlog.plugin import LogCaptureHandler
+
 
 logger = logging.getLogger('pytest_catchlog.test.perf')
 
+DEBUG_CALLS = 100
+
 
 def test_log_emit(benchmark):
     benchmark(logger.info, 'Testing %s performance: %s',
               'catchlog', 'emit a single log record')
+
+
+def log_debug_heavy():
+    for i in range(DEBUG_CALLS):
+        logger.debug('Testing %s performance: %d', 'catchlog', i)
+
+
+def test_log_debug_heavy(benchmark):
+    benchmark(log_debug_heavy)
+
+
+@pytest.mark.parametrize('capture_level', ['NOTSET', 'WARNING'])
+def test_log_debug_heavy_capture_level(benchmark, detached_root_logger,
+                                       capture_level):
+    """What --log-capture-level saves when nobody consumes DEBUG records."""
+    with logging_at_level(logging.WARNING):
+        with catching_logs(LogCaptureHandler(),
+                           level=getattr(logging, capture_level)):
+            benchmark(log_debug_heavy)
@@ -0,0 +1,67 @@
+from __future__ import absolute_import, division, print_function
+
+import gc
+
+import pytest
+
+
+SESSION_TEMPLATE = '''
+import logging
+
+import pytest
+
+
+logger = logging.getLogger('pytest_catchlog.test.perf.session')
+
+
+@pytest.mark.parametrize('i', range({size}))
+def test_logging(i):
+    for n in range({logs}):
+        logger.info('Testing %r memory usage: record %d of test %d',
+                    'catchlog', n, i)
+'''
+
+
+class SessionMemoryTracer(object):
+    """Traces memory allocated while running a nested session."""
+
+    def __init__(self, tracemalloc):
+        self.tracemalloc = tracemalloc
+        self.peak = self.retained = None
+
+    def pytest_sessionstart(self, session):
+        gc.collect()
+        self.tracemalloc.start()
+
+    @pytest.mark.trylast
+    def pytest_sessionfinish(self, session):
+        # Items (along with their report sections) are still alive here.
+        gc.collect()
+        self.retained, self.peak = self.tracemalloc.get_traced_memory()
+        self.tracemalloc.stop()
+
+
+def test_session_memory(benchmark, extra_info, pytestconfig, tmpdir,
+                        nested_mode_args, detached_root_logger):
+    tracemalloc = pytest.importorskip('tracemalloc')  # Python 3.4+
+
+    size = pytestconfig.getoption('memory_session_size')
+    logs = pytestconfig.getoption('memory_session_logs')
+    tmpdir.join('test_session.py').write(
+        SESSION_TEMPLATE.format(size=size, logs=logs))
+
+    tracer = SessionMemoryTracer(tracemalloc)
+    args = [str(tmpdir), '--confcutdir={0}'.format(tmpdir),
+            '-q', '-p', 'no:cacheprovider'] + nested_mode_args
+
+    benchmark.group = 'memory'
+    ret = benchmark.pedantic(pytest.main, args=(args, [tracer]),
+                             rounds=1, iterations=1)
+    assert ret == 0
+
+    extra_info.update({
+        'session_size': size,
+        'session_logs': logs,
+        'peak_bytes': tracer.peak,
+        'retained_bytes': tracer.retained,
+    })
@@ -0,0 +1,33 @@
+from __future__ import absolute_import, division, print_function
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def single_test_dir(tmpdir_factory):
+    # Shared, since nested sessions would reuse the already imported module.
+    tmpdir = tmpdir_factory.mktemp('startup')
+    tmpdir.join('test_single.py').write('def test_nothing():\n    pass\n')
+    return tmpdir
+
+
+def test_startup_collect_only(benchmark, single_test_dir, nested_mode_args,
+                              detached_root_logger):
+    args = [str(single_test_dir), '--confcutdir={0}'.format(single_test_dir),
+            '--collect-only', '-qq', '-p', 'no:cacheprovider'] + nested_mode_args
+
+    benchmark.group = 'startup'
+    ret = benchmark.pedantic(pytest.main, args=(args,),
+                             rounds=10, iterations=1)
+    assert ret == 0
+
+
+def test_startup_single_test(benchmark, single_test_dir, nested_mode_args,
+                             detached_root_logger):
+    args = [str(single_test_dir), '--confcutdir={0}'.format(single_test_dir),
+            '-k', 'nothing', '-qq', '-p', 'no:cacheprovider'] + nested_mode_args
+
+    benchmark.group = 'startup'
+    ret = benchmark.pedantic(pytest.main, args=(args,),
+                             rounds=10, iterations=1)
+    assert ret == 0
@@ -10,8 +10,11 @@ except ImportError:  # Python 2
 import py
 import pytest
 
-from .data import gen_dict, load_benchmarks_from_files, ls_bench_storage
+from .data import (gen_dict, bench_cache_file, load_raw_benchmarks,
+                   ls_bench_storage, prepare_benchmarks,
+                   prepare_benchmark_stats)
 from .plot import make_plot
+from .report import write_report
 
 
 BENCH_DIR = py.path.local(__file__).dirpath('bench')
@@ -122,7 +125,21 @@ def handle_perf_graph(config, terminalreporter):
      garbage) = ls_bench_storage(bench_storage, modes=sorted(mode_args_map))
     cleanup_garbage_files(garbage, terminalreporter, dry_run=True)
 
-    benchmarks = load_benchmarks_from_files(benchmark_files, trial_names)
+    raw_benchmarks = load_raw_benchmarks(
+        benchmark_files, cache_file=bench_cache_file(bench_storage))
+    benchmarks = prepare_benchmarks(raw_benchmarks, trial_names)
+
+    if config.getoption('run_perf') in ('yes', 'only') and trial_names:
+        report_hook_overhead(trial_names[-1], benchmarks, terminalreporter)
+
+    report_file = config.getoption('perf_report_name')
+    if report_file and trial_names:
+        report_file = os.path.join(bench_storage, report_file)
+        write_report(report_file, trial_names,
+                     prepare_benchmark_stats(raw_benchmarks, trial_names))
+        terminalreporter.write_line(
+            'perf-report: Saved report into {0}'.format(report_file),
+            green=True, bold=True)
 
     output_file = config.getoption('perf_graph_name')
     if not output_file:
@@ -147,6 +164,7 @@ def handle_perf_graph(config, terminalreporter):
         history2=history2,
         expr=expr,
         expr2=expr2,
+        title=config.getoption('perf_graph_title'),
     )
     plot.render_to_file(output_file)
 
@@ -155,6 +173,46 @@ def handle_perf_graph(config, terminalreporter):
         green=True, bold=True)
 
 
+HOOK_BENCHMARKS = [
+    ('setup',       'hookwrapper[setup]'),
+    ('call',        'hookwrapper[call]'),
+    ('teardown',    'hookwrapper[teardown]'),
+    ('runtestloop', 'hookwrapper[runtestloop]'),
+]
+
+
+def report_hook_overhead(trial_name, benchmarks, terminalreporter,
+                         baseline='off'):
+    """Show what each hookwrapper costs compared to the baseline mode."""
+    if baseline not in benchmarks:
+        return
+    modes = sorted(mode for mode in benchmarks if mode != baseline)
+
+    def lookup(mode, bench_id):
+        env = BenchmarkEnv(benchmarks[mode][-1])
+        try:
+            return env[bench_id]
+        except (KeyError, env.UndefinedValue):
+            return None
+
+    writeln = terminalreporter.write_line
+    writeln('perf-test: Hookwrapper overhead relative to {0!r} '
+            'in {1} (min, usec):'.format(baseline, trial_name), bold=True)
+    writeln('\t{0:<12}'.format('hook') +
+            ''.join('{0:>12}'.format(mode) for mode in modes))
+
+    for hook, bench_id in HOOK_BENCHMARKS:
+        base = lookup(baseline, bench_id)
+        cells = []
+        for mode in modes:
+            value = lookup(mode, bench_id)
+            if value is None or base is None:
+                cells.append('{0:>12}'.format('-'))
+            else:
+                cells.append('{0:>+12.3f}'.format((value - base) * 1e6))
+        writeln('\t{0:<12}'.format(hook) + ''.join(cells))
+
+
 @gen_dict
 def eval_benchmark_expr(expr, benchenvs, **kwargs):
     for mode, envlist in benchenvs.items():
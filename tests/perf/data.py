@@ -2,10 +2,11 @@ from __future__ import absolute_import, division, print_function
 
 import io
 import json
+import os
 import os.path
+import re
 from collections import defaultdict
 from functools import wraps
-from glob import glob
 from itertools import chain
 
 
@@ -16,22 +17,48 @@ def gen_dict(func):
     return decorated
 
 
+# NNNN just reflects the pytest-benchmark result files naming scheme:
+# NNNN_commit*.json, that is, 0001_commit*.json, 0002_commit*.json, ...
+NNNN_FILE_RE = re.compile(r'^[0-9]{4}_.*\.json$')
+
+# Only these stats are kept in the cache, the rest of a (rather bulky)
+# pytest-benchmark results file is never used.
+CACHED_STATS = ('min', 'max', 'mean', 'median', 'stddev', 'rounds')
+
+# Numeric 'extra_info' values (e.g. memory usage) are exposed as additional
+# pseudo-benchmarks named 'fullname.key', e.g. 'test_foo.peak_bytes'.
+EXTRA_INFO_SEP = '.'
+
+# Bump whenever compact_trial() output changes to discard stale caches.
+CACHE_VERSION = 2
+
+
+def ls_mode_dir(mode_dirname):
+    """List NNNN_commit*.json files of a single mode directory at once."""
+    try:
+        basenames = os.listdir(mode_dirname)
+    except OSError:  # no benchmarks stored for that mode yet
+        return []
+    return sorted(b for b in basenames if NNNN_FILE_RE.match(b))
+
+
 def ls_bench_storage(bench_storage, modes):
-    # NNNN just reflects the pytest-benchmark result files naming scheme:
-    # NNNN_commit*.json, that is, 0001_commit*.json, 0002_commit*.json, ...
     nnnn_files_map = defaultdict(dict)  # {'NNNN': {'mode': 'filename'}}
     garbage_files = set()
 
     for mode in modes:
-        for filename in glob(os.path.join(bench_storage, mode,
-                                          '[0-9][0-9][0-9][0-9]_*.json')):
-            mode_dirname, basename = os.path.split(filename)
+        mode_dirname = os.path.join(bench_storage, mode)
+
+        mode_nnnn_files = defaultdict(list)  # {'NNNN': ['filename', ...]}
+        for basename in ls_mode_dir(mode_dirname):
             nnnn = os.path.splitext(basename)[0][:12]  # NNNN_commit
-            mode_nnnn_files = glob(os.path.join(mode_dirname, nnnn + '*.json'))
-            if len(mode_nnnn_files) != 1:
-                garbage_files.update(mode_nnnn_files)
+            mode_nnnn_files[nnnn].append(os.path.join(mode_dirname, basename))
+
+        for nnnn, filenames in mode_nnnn_files.items():
+            if len(filenames) != 1:
+                garbage_files.update(filenames)
             else:
-                nnnn_files_map[nnnn][mode] = filename
+                nnnn_files_map[nnnn][mode] = filenames[0]
 
     benchmark_files = defaultdict(dict)  # {'mode': {'NNNN': 'filename'}}
 
@@ -47,17 +74,86 @@ def ls_bench_storage(bench_storage, modes):
     return sorted(nnnn_files_map), dict(benchmark_files), sorted(garbage_files)
 
 
+def compact_trial(trial):
+    """Strip a raw pytest-benchmark trial down to the stats we use."""
+    return {'benchmarks': [
+        {'fullname': bench['fullname'],
+         'stats': dict((name, bench['stats'].get(name))
+                       for name in CACHED_STATS),
+         'extra_info': dict((key, value)
+                            for key, value in bench.get('extra_info',
+                                                        {}).items()
+                            if isinstance(value, (int, float)))}
+        for bench in trial.get('benchmarks', [])
+    ]}
+
+
+class TrialCache(object):
+    """Compact stats extracted from result files, keyed by path and mtime.
+
+    Only files that are new (or modified) since the last run get parsed,
+    everything else is served from a single JSON file.
+    """
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self.entries = {}  # {'filename': {'mtime': ..., 'trial': {...}}}
+        self.dirty = False
+
+        if cache_file is not None:
+            try:
+                with io.open(cache_file, 'rU') as fh:
+                    cached = json.load(fh)
+                if cached.get('version') != CACHE_VERSION:
+                    raise ValueError('Outdated cache format')
+                self.entries = cached['entries']
+            except (IOError, OSError, ValueError, KeyError, AttributeError):
+                self.dirty = True  # missing or corrupt, rebuild from scratch
+
+    def load(self, filename):
+        mtime = os.path.getmtime(filename)
+
+        entry = self.entries.get(filename)
+        if entry is None or entry['mtime'] != mtime:
+            with io.open(filename, 'rU') as fh:
+                trial = compact_trial(json.load(fh))
+            entry = self.entries[filename] = {'mtime': mtime, 'trial': trial}
+            self.dirty = True
+
+        return entry['trial']
+
+    def save(self, used_filenames):
+        stale = set(self.entries) - set(used_filenames)
+        for filename in stale:
+            del self.entries[filename]
+
+        if self.cache_file is None or not (self.dirty or stale):
+            return
+
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w') as fh:
+            json.dump({'version': CACHE_VERSION, 'entries': self.entries},
+                      fh, separators=(',', ':'))
+        os.rename(tmp_file, self.cache_file)  # never leave a torn cache
+        self.dirty = False
+
+
 @gen_dict  # {'mode': {'NNNN': benchmark, ...}}
-def load_raw_benchmarks(benchmark_files):
+def load_raw_benchmarks(benchmark_files, cache_file=None):
+    cache = TrialCache(cache_file)
+    used_filenames = []
+
     for mode, filemap in benchmark_files.items():
         trialmap = {}
 
         for trial_name, filename in filemap.items():
-            with io.open(filename, 'rU') as fh:
-                trialmap[trial_name] = json.load(fh)
+            trialmap[trial_name] = cache.load(filename)
+            used_filenames.append(filename)
 
         yield mode, trialmap
 
+    cache.save(used_filenames)
+
 
 @gen_dict  # {'mode': [{'test': min}...]}
 def prepare_benchmarks(raw_benchmarks, trial_names):
@@ -69,17 +165,45 @@ def prepare_benchmarks(raw_benchmarks, trial_names):
 
             benchenv = dict((bench['fullname'], bench['stats'].get('min'))
                             for bench in trial)
+            for bench in trial:
+                for key, value in bench.get('extra_info', {}).items():
+                    benchenv[bench['fullname'] + EXTRA_INFO_SEP + key] = value
             envlist.append(benchenv)
 
         yield mode, envlist
 
 
+@gen_dict  # {'mode': [{'test': {'mean': ..., 'stddev': ...}}...]}
+def prepare_benchmark_stats(raw_benchmarks, trial_names):
+    for mode, trialmap in raw_benchmarks.items():
+        statslist = []
+
+        for trial_name in trial_names:
+            trial = trialmap.get(trial_name, {}).get('benchmarks', [])
+
+            benchstats = dict((bench['fullname'], bench['stats'])
+                              for bench in trial)
+            for bench in trial:
+                for key, value in bench.get('extra_info', {}).items():
+                    # A single sample, nothing to estimate deviation from.
+                    benchstats[bench['fullname'] + EXTRA_INFO_SEP + key] = {
+                        'min': value, 'mean': value, 'stddev': 0}
+            statslist.append(benchstats)
+
+        yield mode, statslist
+
+
 def load_benchmarks(bench_storage, modes):
     trial_names, benchmark_files, _ = ls_bench_storage(bench_storage, modes)
-    return load_benchmarks_from_files(benchmark_files, trial_names)
+    return load_benchmarks_from_files(benchmark_files, trial_names,
+                                      cache_file=bench_cache_file(bench_storage))
+
+
+def bench_cache_file(bench_storage):
+    return os.path.join(bench_storage, '.stats-cache.json')
 
 
-def load_benchmarks_from_files(benchmark_files, trial_names):
-    raw_benchmarks = load_raw_benchmarks(benchmark_files)
+def load_benchmarks_from_files(benchmark_files, trial_names, cache_file=None):
+    raw_benchmarks = load_raw_benchmarks(benchmark_files, cache_file)
     benchmarks = prepare_benchmarks(raw_benchmarks, trial_names)
     return benchmarks
@@ -40,7 +40,8 @@ def history_range(history):
         return (0, log_ceil(max_))
 
 
-def make_plot(trial_names, history, history2, expr, expr2):
+def make_plot(trial_names, history, history2, expr, expr2,
+              title='Speed in seconds'):
     style = DefaultStyle(colors=[
             '#ED6C1D',  # 3
             '#EDC51E',  # 4
@@ -59,7 +60,7 @@ def make_plot(trial_names, history, history2, expr, expr2):
     )
 
     plot = pygal.Line(
-        title="Speed in seconds",
+        title=title,
         x_title="Trial",
         x_labels=trial_names,
         x_label_rotation=15,
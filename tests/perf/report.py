@@ -0,0 +1,245 @@
+from __future__ import absolute_import, division, print_function
+
+import io
+import math
+from xml.sax.saxutils import escape, quoteattr
+
+from .data import EXTRA_INFO_SEP, gen_dict
+
+
+MODE_COLORS = [
+    '#ED6C1D',
+    '#1E45ED',
+    '#1FED34',
+    '#A71DED',
+    '#EDC51E',
+    '#1FEDE4',
+]
+
+CHART_WIDTH = 860
+CHART_HEIGHT = 280
+MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 70, 20, 15, 70
+
+STYLE = '''
+body { font-family: sans-serif; margin: 2em; color: #222; }
+h1 { font-size: 1.4em; }
+h2 { font-size: 1.1em; margin-top: 2.5em; font-family: monospace; }
+table { border-collapse: collapse; margin: .5em 0; }
+th, td { padding: .2em .8em; text-align: right; }
+th:first-child, td:first-child { text-align: left; }
+tr:nth-child(even) { background: #f4f4f4; }
+.legend span { display: inline-block; margin-right: 1.5em; }
+.legend i { display: inline-block; width: 1em; height: .6em;
+            margin-right: .3em; }
+svg text { font-size: 11px; fill: #444; }
+svg .grid { stroke: #ddd; }
+svg .zero { stroke: #888; }
+'''
+
+
+def trial_label(trial_name):
+    """Make a label like '0042 c0ffee1' out of a '0042_c0ffee1' file name."""
+    nnnn, _, commit = trial_name.partition('_')
+    return '{0} {1}'.format(nnnn, commit) if commit else nnnn
+
+
+def bench_unit(bench_name):
+    """Return (scale, unit) used to display values of a benchmark."""
+    key = bench_name.rpartition(EXTRA_INFO_SEP)[2]
+    if key.endswith('_bytes'):
+        return 1 / 1024, 'KiB'
+    if EXTRA_INFO_SEP in bench_name.rpartition('::')[2]:
+        return 1, ''
+    return 1e6, 'usec'
+
+
+@gen_dict  # {'test': {'mode': [(delta, band) or None, ...]}}
+def compute_overheads(stats, baseline='off'):
+    """Overhead of each mode relative to the baseline, trial by trial.
+
+    The band is a one stddev estimate combined from both modes.
+    """
+    base_statslist = stats.get(baseline)
+    if base_statslist is None:
+        return
+
+    modes = sorted(mode for mode in stats if mode != baseline)
+    bench_names = set()
+    for mode in modes:
+        for benchstats in stats[mode]:
+            bench_names.update(benchstats)
+
+    for bench_name in sorted(bench_names):
+        overheads = {}
+        for mode in modes:
+            serie = []
+            for base, other in zip(base_statslist, stats[mode]):
+                base, other = base.get(bench_name), other.get(bench_name)
+                if (base is None or other is None or
+                        base.get('mean') is None or
+                        other.get('mean') is None):
+                    serie.append(None)
+                    continue
+                band = math.sqrt((base.get('stddev') or 0) ** 2 +
+                                 (other.get('stddev') or 0) ** 2)
+                serie.append((other['mean'] - base['mean'], band))
+            overheads[mode] = serie
+        yield bench_name, overheads
+
+
+def nice_ticks(lo, hi, count=5):
+    span = (hi - lo) or abs(hi) or 1
+    step = 10 ** math.floor(math.log10(span / count))
+    for mult in (1, 2, 5, 10):
+        if span / (step * mult) <= count:
+            step *= mult
+            break
+    first = math.floor(lo / step)
+    last = math.ceil(hi / step)
+    return [n * step for n in range(int(first), int(last) + 1)]
+
+
+def split_segments(points):
+    """Split a list of points on None gaps."""
+    segment = []
+    for point in points:
+        if point is None:
+            if segment:
+                yield segment
+            segment = []
+        else:
+            segment.append(point)
+    if segment:
+        yield segment
+
+
+def render_chart(trial_names, overheads, scale, unit, colors):
+    values = [(delta + sign * band) * scale
+              for serie in overheads.values()
+              for point in serie if point is not None
+              for delta, band in [point]
+              for sign in (-1, 1)]
+    ticks = nice_ticks(min(values + [0]), max(values + [0]))
+    lo, hi = ticks[0], ticks[-1]
+
+    plot_w = CHART_WIDTH - MARGIN_LEFT - MARGIN_RIGHT
+    plot_h = CHART_HEIGHT - MARGIN_TOP - MARGIN_BOTTOM
+
+    def x(i):
+        if len(trial_names) == 1:
+            return MARGIN_LEFT + plot_w / 2
+        return MARGIN_LEFT + plot_w * i / (len(trial_names) - 1)
+
+    def y(value):
+        return MARGIN_TOP + plot_h * (hi - value) / ((hi - lo) or 1)
+
+    out = ['<svg xmlns="http://www.w3.org/2000/svg" '
+           'width="{0}" height="{1}">'.format(CHART_WIDTH, CHART_HEIGHT)]
+
+    for tick in ticks:
+        out.append('<line class="{0}" x1="{1}" x2="{2}" y1="{3:.1f}" '
+                   'y2="{3:.1f}"/>'.format('zero' if tick == 0 else 'grid',
+                                           MARGIN_LEFT, MARGIN_LEFT + plot_w,
+                                           y(tick)))
+        out.append('<text x="{0}" y="{1:.1f}" text-anchor="end">{2:g}</text>'
+                   .format(MARGIN_LEFT - 6, y(tick) + 4, round(tick, 6)))
+    out.append('<text x="12" y="{0}" transform="rotate(-90 12 {0})" '
+               'text-anchor="middle">{1}</text>'
+               .format(MARGIN_TOP + plot_h / 2, escape(unit)))
+
+    for i, trial_name in enumerate(trial_names):
+        out.append('<text x="{0:.1f}" y="{1}" text-anchor="end" '
+                   'transform="rotate(-35 {0:.1f} {1})">{2}</text>'
+                   .format(x(i), MARGIN_TOP + plot_h + 14,
+                           escape(trial_label(trial_name))))
+
+    for mode in sorted(overheads):
+        color = colors[mode]
+        points = [None if point is None else (i, point[0] * scale,
+                                              point[1] * scale)
+                  for i, point in enumerate(overheads[mode])]
+
+        for segment in split_segments(points):
+            upper = ['{0:.1f},{1:.1f}'.format(x(i), y(delta + band))
+                     for i, delta, band in segment]
+            lower = ['{0:.1f},{1:.1f}'.format(x(i), y(delta - band))
+                     for i, delta, band in reversed(segment)]
+            out.append('<polygon points="{0}" fill="{1}" fill-opacity="0.15" '
+                       'stroke="none"/>'.format(' '.join(upper + lower),
+                                                color))
+            out.append('<polyline points="{0}" fill="none" stroke="{1}" '
+                       'stroke-width="2"/>'.format(
+                           ' '.join('{0:.1f},{1:.1f}'.format(x(i), y(delta))
+                                    for i, delta, _ in segment), color))
+            for i, delta, band in segment:
+                title = '{0} @ {1}: {2:+.3f} &#177; {3:.3f} {4}'.format(
+                    escape(mode), escape(trial_label(trial_names[i])),
+                    delta, band, escape(unit))
+                out.append('<circle cx="{0:.1f}" cy="{1:.1f}" r="3" '
+                           'fill="{2}"><title>{3}</title></circle>'
+                           .format(x(i), y(delta), color, title))
+
+    out.append('</svg>')
+    return '\n'.join(out)
+
+
+def render_latest_table(trial_names, overheads, scale, unit):
+    out = ['<table><tr><th>mode</th><th>overhead in {0} ({1})</th></tr>'
+           .format(escape(trial_label(trial_names[-1])), escape(unit))]
+    for mode in sorted(overheads):
+        point = overheads[mode][-1]
+        if point is None:
+            cell = '-'
+        else:
+            cell = '{0:+.3f} &#177; {1:.3f}'.format(point[0] * scale,
+                                                    point[1] * scale)
+        out.append('<tr><td>{0}</td><td>{1}</td></tr>'
+                   .format(escape(mode), cell))
+    out.append('</table>')
+    return '\n'.join(out)
+
+
+def render_report(trial_names, stats, baseline='off'):
+    """Render a self-contained HTML report of overheads of all benchmarks."""
+    overheads_map = compute_overheads(stats, baseline)
+    modes = sorted(mode for mode in stats if mode != baseline)
+    colors = dict((mode, MODE_COLORS[i % len(MODE_COLORS)])
+                  for i, mode in enumerate(modes))
+
+    out = ['<!DOCTYPE html>',
+           '<html><head><meta charset="utf-8">',
+           '<title>pytest-catchlog performance report</title>',
+           '<style>{0}</style>'.format(STYLE),
+           '</head><body>',
+           '<h1>Overhead relative to {0!r} mode, mean &#177; stddev</h1>'
+           .format(escape(baseline)),
+           '<p class="legend">']
+    for mode in modes:
+        out.append('<span><i style="background: {0}"></i>{1}</span>'
+                   .format(colors[mode], escape(mode)))
+    out.append('</p>')
+
+    out.append('<ul>')
+    for bench_name in sorted(overheads_map):
+        out.append('<li><a href="#{0}">{1}</a></li>'.format(
+            escape(bench_name, {'"': '&quot;'}), escape(bench_name)))
+    out.append('</ul>')
+
+    for bench_name in sorted(overheads_map):
+        overheads = overheads_map[bench_name]
+        if not any(p is not None for s in overheads.values() for p in s):
+            continue
+        scale, unit = bench_unit(bench_name)
+        out.append('<h2 id={0}>{1}</h2>'.format(quoteattr(bench_name),
+                                                escape(bench_name)))
+        out.append(render_chart(trial_names, overheads, scale, unit, colors))
+        out.append(render_latest_table(trial_names, overheads, scale, unit))
+
+    out.append('</body></html>')
+    return '\n'.join(out)
+
+
+def write_report(output_file, trial_names, stats, baseline='off'):
+    html = render_report(trial_names, stats, baseline)
+    with io.open(output_file, 'w', encoding='utf-8') as fh:
+        fh.write(html if isinstance(html, type(u'')) else html.decode('utf-8'))
@@ -4,9 +4,12 @@ import os
 import os.path
 import sys
 import subprocess
+import time
 
 import pytest
 
+from .conftest import mode_args_map
+
 
 PYTEST_PATH = (os.path.abspath(pytest.__file__.rstrip("oc"))
                .replace("$py.class", ".py"))
@@ -14,38 +17,89 @@ PYTEST_PATH = (os.path.abspath(pytest.__file__.rstrip("oc"))
 POPEN_CLEANUP_TIMEOUT = 3 if (sys.version_info[0] >= 3) else 0  # Py3k only
 
 
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # Python < 3.3 or not Linux
+        return []
+
+
+def pinned_to(cpu):
+    """Make a preexec_fn binding the child process to a single CPU core."""
+    if cpu is None:
+        return None
+
+    def preexec_fn():
+        os.sched_setaffinity(0, [cpu])
+    return preexec_fn
+
+
+def round_assignment(modes, cpus, rep):
+    """Return (mode, cpu) pairs of the rep-th round, in the start order.
+
+    Both the start order and the cores rotate from round to round, so that
+    over len(modes) rounds every mode is started first once and runs on
+    every core once: neither a particularly slow/fast core nor being started
+    first sticks to the same mode throughout the run.
+    """
+    shift = rep % len(modes)
+    order = modes[shift:] + modes[:shift]
+    return [(mode, cpus[(modes.index(mode) + shift) % len(cpus)])
+            for mode in order]
+
+
+def wait_all(popens):
+    __tracebackhide__ = True
+    try:
+        rets = [popen.wait() for popen in popens]
+    except KeyboardInterrupt as e:
+        # Before proceeding to the exit, give the children the last chance to
+        # cleanup. Otherwise, benchmark storage may happen to be read
+        # during preparing the final reporting (see ls_bench_storage(),
+        # called from handle_perf_graph()), while being concurrently
+        # modified by a child (pytest-benchmark writing results files).
+        try:
+            if POPEN_CLEANUP_TIMEOUT:
+                deadline = time.time() + POPEN_CLEANUP_TIMEOUT
+                for popen in popens:
+                    try:
+                        popen.wait(timeout=max(deadline - time.time(), 0))
+                    except subprocess.TimeoutExpired:
+                        pass
+        finally:
+            raise e
+    else:
+        assert rets == [0] * len(popens)
+
+
 @pytest.fixture
-def popen(request):
+def popen_env():
     env = os.environ.copy()
     cwd = os.getcwd()
     pythonpath = [cwd]
     if env.get('PYTHONPATH'):
         pythonpath.append(env['PYTHONPATH'])
     env['PYTHONPATH'] = os.pathsep.join(pythonpath)
+    return env
 
-    def popen_wait(*args, **kwargs):
-        __tracebackhide__ = True
 
+@pytest.fixture
+def popen_start(popen_env):
+    def popen_start(*args, **kwargs):
         args = [str(arg) for arg in args]
-        kwargs['env'] = dict(env, **kwargs.get('env', {}))
+        kwargs['env'] = dict(popen_env, **kwargs.get('env', {}))
 
         print('Running', ' '.join(args))
-        popen = subprocess.Popen(args, **kwargs)
-        try:
-            ret = popen.wait()
-        except KeyboardInterrupt as e:
-            # Before proceeding to the exit, give the child the last chance to
-            # cleanup. Otherwise, benchmark storage may happen to be read
-            # during preparing the final reporting (see ls_bench_storage(),
-            # called from handle_perf_graph()), while being concurrently
-            # modified by the child (pytest-benchmark writing results files).
-            try:
-                if POPEN_CLEANUP_TIMEOUT:
-                    popen.wait(timeout=POPEN_CLEANUP_TIMEOUT)
-            finally:
-                raise e
-        else:
-            assert ret == 0
+        return subprocess.Popen(args, **kwargs)
+
+    return popen_start
+
+
+@pytest.fixture
+def popen(popen_start):
+    def popen_wait(*args, **kwargs):
+        __tracebackhide__ = True
+        wait_all([popen_start(*args, **kwargs)])
 
     return popen_wait
 
@@ -76,17 +130,34 @@ def base_args(bench_dir, verbosity, color):
     ]
 
 
-@pytest.fixture
-def bench_args(pytestconfig, storage_dir):
+def make_memory_args(pytestconfig):
+    size = pytestconfig.getoption('perf_memory_size')
+    logs = pytestconfig.getoption('perf_memory_logs')
+    if size is None and pytestconfig.getoption('run_perf') == 'check':
+        size = 10  # just make sure it works
+    args = []
+    if size is not None:
+        args.append('--memory-session-size={0}'.format(size))
+    if logs is not None:
+        args.append('--memory-session-logs={0}'.format(logs))
+    return args
+
+
+def make_bench_args(pytestconfig, storage_dir):
     if pytestconfig.getoption('run_perf') != 'check':
         return [
             '--benchmark-only',
             '--benchmark-disable-gc',
             '--benchmark-autosave',
             '--benchmark-storage={0}'.format(storage_dir),
-        ]
+        ] + make_memory_args(pytestconfig)
     else:
-        return ['--benchmark-disable']
+        return ['--benchmark-disable'] + make_memory_args(pytestconfig)
+
+
+@pytest.fixture
+def bench_args(pytestconfig, storage_dir):
+    return make_bench_args(pytestconfig, storage_dir)
 
 
 @pytest.fixture
@@ -94,5 +165,76 @@ def perf_args(base_args, mode_args, bench_args):
     return base_args + mode_args + bench_args
 
 
-def test_perf_run(popen, perf_args):
+@pytest.fixture
+def perf_args_for(pytestconfig, base_args):
+    """Same as 'perf_args', but for any mode, not just a parametrized one."""
+    storage = pytestconfig.getoption('--benchmark-storage')
+
+    def perf_args_for(mode):
+        storage_dir = os.path.join(storage, mode)
+        return (base_args + mode_args_map[mode] +
+                make_bench_args(pytestconfig, storage_dir))
+
+    return perf_args_for
+
+
+@pytest.fixture
+def perf_parallel(pytestconfig):
+    return pytestconfig.getoption('perf_parallel')
+
+
+def test_perf_run(popen, perf_args, perf_parallel):
+    if perf_parallel:
+        pytest.skip('running all modes at once, see test_perf_run_parallel')
     popen(sys.executable, PYTEST_PATH, *perf_args)
+
+
+def test_perf_run_parallel(pytestconfig, popen_start, perf_args_for,
+                           perf_parallel):
+    if not perf_parallel:
+        pytest.skip('not requested, see --perf-parallel')
+    __tracebackhide__ = True
+
+    modes = sorted(mode_args_map)
+    cpus = available_cpus()
+    if len(cpus) < len(modes):
+        print('Not enough CPU cores to pin each mode to, running unpinned')
+        cpus = [None] * len(modes)
+    else:
+        cpus = cpus[-len(modes):]  # leave the first core(s) for the rest
+
+    repeat = pytestconfig.getoption('perf_repeat')
+    visited = set()
+    for rep in range(repeat):
+        assignment = round_assignment(modes, cpus, rep)
+        visited.update(assignment)
+
+        popens = []
+        try:
+            for mode, cpu in assignment:
+                popens.append(popen_start(sys.executable, PYTEST_PATH,
+                                          *perf_args_for(mode),
+                                          preexec_fn=pinned_to(cpu)))
+        except BaseException:
+            # Don't leave the started ones writing into the benchmark storage
+            # behind our back, but report why starting the rest failed.
+            for popen in popens:
+                popen.wait()
+            raise
+        wait_all(popens)
+
+    if repeat >= len(modes):
+        assert visited == set((mode, cpu) for mode in modes for cpu in cpus)
+
+
+def test_round_assignment():
+    modes = ['default', 'nocapture', 'noprint', 'off']
+    cpus = [4, 5, 6, 7]
+    rounds = [round_assignment(modes, cpus, rep) for rep in range(len(modes))]
+
+    # Each mode runs on every core, and each is started first once.
+    assert set(pair for pairs in rounds for pair in pairs) == set(
+        (mode, cpu) for mode in modes for cpu in cpus)
+    assert sorted(pairs[0][0] for pairs in rounds) == modes
+    for pairs in rounds:
+        assert sorted(cpu for _, cpu in pairs) == cpus
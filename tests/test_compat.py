@@ -78,3 +78,10 @@ def test_records_modification(testdir):
         ''')
     result = testdir.runpytest()
     assert result.ret == 0
+
+
+def test_fixtures_importable_from_fixture_module():
+    from pytest_catchlog import fixture, plugin
+
+    assert fixture.caplog is plugin.caplog
+    assert fixture.capturelog is plugin.capturelog
@@ -71,6 +71,115 @@ def test_clear(caplog):
     assert len(caplog.records)
     caplog.clear()
     assert not len(caplog.records)
+    assert not caplog.text
+    assert not list(caplog.iter_lines())
+
+
+def test_checkpoint(caplog):
+    logger.info('foo')
+    checkpoint = caplog.checkpoint()
+    logger.info('bar')
+
+    records, text = caplog.since(checkpoint)
+    assert [r.msg for r in records] == ['bar']
+    assert 'bar' in text and 'foo' not in text
+    assert 'foo' in caplog.text  # nothing discarded
+
+    caplog.clear()
+    logger.info('baz')
+    records, text = caplog.since(checkpoint)
+    assert [r.msg for r in records] == ['baz']
+
+
+def test_text_not_copied_until_changed(caplog):
+    logger.info('foo')
+    text = caplog.text
+    assert caplog.text is text
+
+    logger.info('bar')
+    assert caplog.text is not text
+    assert 'foo' in caplog.text and 'bar' in caplog.text
+
+
+def test_iter_lines(caplog):
+    logger.info('foo')
+    logger.info('bar\nbaz')
+    assert len(list(caplog.iter_lines())) == 3
+
+    logger.info('qux')
+    new_lines = list(caplog.iter_lines(since=2))
+    assert len(new_lines) == 2
+    assert new_lines[0] == 'baz'
+    assert new_lines[1].endswith('qux')
+    assert not list(caplog.iter_lines(since=4))
+
+
+def test_exception_rendered(caplog):
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception('oops')
+
+    record = caplog.records[0]
+    assert record.exc_info is None
+    assert 'ZeroDivisionError' in record.exc_text
+    assert record.exc_text in caplog.text
+
+
+def test_caplog_requested_dynamically(testdir):
+    testdir.makepyfile('''
+        import logging
+        import pytest
+
+        logger = logging.getLogger(__name__)
+
+        @pytest.fixture
+        def logs(request):
+            return request.getfuncargvalue('caplog')
+
+        def test_in_test(request):
+            caplog = request.getfuncargvalue('caplog')
+            logger.info('boo %s', 'arg')
+            assert caplog.record_tuples == [(__name__, logging.INFO, 'boo arg')]
+            assert 'boo arg' in caplog.text
+
+        def test_in_fixture(logs):
+            logger.info('boo %s', 'arg')
+            assert [r.getMessage() for r in logs.records] == ['boo arg']
+        ''')
+    for args in [('--no-print-logs',), ()]:
+        result = testdir.runpytest(*args)
+        assert result.ret == 0
+
+
+def test_capture_level(testdir):
+    testdir.makepyfile('''
+        import logging
+
+        logger = logging.getLogger(__name__)
+
+        def test_foo(caplog):
+            assert not logger.isEnabledFor(logging.INFO)
+            logger.info('boo')
+            logger.warning('bar')
+            assert [r.msg for r in caplog.records] == ['bar']
+
+        def test_set_level(caplog):
+            caplog.set_level(logging.DEBUG)
+            logger.debug('boo')
+            assert [r.msg for r in caplog.records] == ['boo']
+
+        def test_at_level(caplog):
+            with caplog.at_level(logging.INFO):
+                logger.info('boo')
+            logger.info('bar')
+            assert [r.msg for r in caplog.records] == ['boo']
+
+        def test_root_level_restored():
+            assert logging.getLogger().level == logging.WARNING
+        ''')
+    result = testdir.runpytest_subprocess('--log-capture-level=WARNING')
+    assert result.ret == 0
 
 
 def test_special_warning_with_del_records_warning(testdir):
@@ -97,3 +206,97 @@ def test_warning_with_setLevel(testdir):
         " use 'caplog.set_level()' instead",
         "*1 pytest-warnings*",
     ])
+
+
+def test_caplog_module(testdir):
+    testdir.makepyfile('''
+        import logging
+        import pytest
+
+        logger = logging.getLogger(__name__)
+
+        @pytest.fixture(scope='module')
+        def expensive(caplog_module):
+            logger.info('bootstrapping')
+            assert caplog_module.record_tuples == [
+                (__name__, logging.INFO, 'bootstrapping'),
+            ]
+            return caplog_module
+
+        def test_first(expensive):
+            logger.info('first')
+
+        def test_second(expensive, caplog):
+            assert 'first' in expensive.text
+            assert 'first' not in caplog.text
+            assert len(expensive.records) == 2
+        ''')
+    result = testdir.runpytest()
+    assert result.ret == 0
+
+
+def test_caplog_module_checkpoint(testdir):
+    testdir.makepyfile('''
+        import logging
+        import pytest
+
+        @pytest.fixture(scope='module')
+        def resource():
+            logging.getLogger('resource').warning('opened')
+
+        def test_foo(resource, caplog_module):
+            checkpoint = caplog_module.checkpoint()
+            logging.getLogger('resource').warning('used')
+            records, text = caplog_module.since(checkpoint)
+            assert [r.getMessage() for r in records] == ['used']
+            assert 'used' in text and 'opened' not in text
+        ''')
+    result = testdir.runpytest('--log-scope-limit=1')
+    assert result.ret == 0
+
+
+def test_caplog_module_set_level(testdir):
+    testdir.makepyfile('''
+        import logging
+        import pytest
+
+        logger = logging.getLogger(__name__)
+
+        @pytest.fixture(scope='module')
+        def verbose(caplog_module):
+            caplog_module.set_level(logging.INFO)
+            return caplog_module
+
+        def test_first(verbose):
+            logger.info('%s test', 'first')
+
+        def test_second(verbose):
+            logger.info('%s test', 'second')
+
+        def test_logged(verbose):
+            assert [r.getMessage() for r in verbose.records] == [
+                'first test', 'second test']
+        ''')
+    for args in [(), ('--no-print-logs',)]:
+        result = testdir.runpytest_subprocess('--log-capture-level=WARNING',
+                                              *args)
+        assert result.ret == 0
+
+
+def test_caplog_session_limit(testdir):
+    testdir.makepyfile('''
+        import logging
+
+        logger = logging.getLogger(__name__)
+
+        def test_foo(caplog_session):
+            for i in range(5):
+                logger.info('record %d', i)
+            assert [r.getMessage() for r in caplog_session.records] == [
+                'record 3', 'record 4']
+            assert caplog_session.dropped == 3
+            assert 'record 2' not in caplog_session.text
+            assert 'record 4' in caplog_session.text
+        ''')
+    result = testdir.runpytest('--log-scope-limit=2')
+    assert result.ret == 0
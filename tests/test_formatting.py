@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import sys
+import logging
+
+import pytest
+
+from pytest_catchlog import formatting
+from pytest_catchlog.formatting import (FastFormatter, FormattedSizes,
+                                        compile_format, exc_info_key)
+from pytest_catchlog.plugin import DEFAULT_LOG_FORMAT, DEFAULT_LOG_DATE_FORMAT
+
+
+u = (lambda x: x.decode('utf-8')) if sys.version_info < (3,) else (lambda x: x)
+
+
+def make_record(msg, args=None, exc_info=None):
+    return logging.LogRecord('foo.bar', logging.INFO, '/path/to/module.py',
+                             42, msg, args, exc_info)
+
+
+def copy_record(record):
+    return logging.makeLogRecord(dict(record.__dict__))
+
+
+@pytest.fixture(params=[
+    DEFAULT_LOG_FORMAT,
+    '%(asctime)s %(levelname)s %(message)s',
+    '%(asctime)s,%(msecs)03d 100%% %(name)r: %(message)s',
+    '%(message)s',
+    None,
+])
+def fmt(request):
+    return request.param
+
+
+@pytest.fixture(params=[None, DEFAULT_LOG_DATE_FORMAT, '%Y-%m-%d %H:%M:%S'])
+def datefmt(request):
+    return request.param
+
+
+@pytest.mark.parametrize('msg, args', [
+    ('boo %s', ('arg',)),
+    (u('bū %d'), (1,)),
+    ('tuple %s', ((1, 2),)),
+    ('no args', None),
+])
+def test_same_output_as_stdlib(fmt, datefmt, msg, args):
+    record = make_record(msg, args)
+    expected = logging.Formatter(fmt, datefmt).format(copy_record(record))
+    formatter = FastFormatter(fmt, datefmt)
+    for _ in range(2):  # the second time uses cached time
+        assert formatter.format(copy_record(record)) == expected
+
+
+def test_same_output_as_stdlib_with_exception(fmt, datefmt):
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        exc_info = sys.exc_info()
+
+    record = make_record('oops', exc_info=exc_info)
+    expected = logging.Formatter(fmt, datefmt).format(copy_record(record))
+    assert FastFormatter(fmt, datefmt).format(copy_record(record)) == expected
+
+
+def test_compile_format():
+    positional, fields, pick = compile_format('%(a)s 100%% %(b)4d')
+    assert positional == '%s 100%% %4d'
+    assert fields == ['a', 'b']
+    assert pick({'a': 'x', 'b': 1, 'c': None}) == ('x', 1)
+
+
+def test_compile_format_positional():
+    assert compile_format('%(a)s %s') is None
+
+
+def test_formatted_line_shared_between_formatters():
+    record = make_record('boo %s', ('arg',))
+
+    formatted = FastFormatter(DEFAULT_LOG_FORMAT, '%H').format(record)
+    assert FastFormatter(DEFAULT_LOG_FORMAT).format(record) is formatted
+
+
+def test_formatted_line_not_shared_between_different_formatters():
+    record = make_record('boo %s', ('arg',))
+
+    FastFormatter('%(asctime)s %(message)s', '%H').format(record)
+    formatted = FastFormatter('%(asctime)s %(message)s', '%M').format(record)
+    assert formatted == logging.Formatter('%(asctime)s %(message)s',
+                                          '%M').format(record)
+
+
+def test_formatted_line_not_stored_on_record():
+    record = make_record('boo %s', ('arg',))
+    attrs = set(make_record('boo %s', ('arg',)).__dict__) | set(['message'])
+
+    FastFormatter(DEFAULT_LOG_FORMAT).format(record)
+    assert set(record.__dict__) <= attrs | set(['asctime'])
+
+
+def test_formatted_sizes_count_records_once():
+    record = make_record(u('bū %s'), ('arg',))
+    sizes = FormattedSizes()
+
+    FastFormatter('%(message)s').format(record)
+    assert sizes.add(record) == (True, 7)  # UTF-8 encoded
+    assert sizes.add(record) == (False, 0)
+    FastFormatter('%(levelname)s %(message)s').format(record)
+    assert sizes.add(record) == (False, 5)
+
+
+def raise_in_loop(count, message='oops'):
+    exc_infos = []
+    for _ in range(count):
+        try:
+            raise ValueError(message)
+        except ValueError:
+            exc_infos.append(sys.exc_info())
+    return exc_infos
+
+
+def test_exception_text_shared_between_same_tracebacks():
+    first, second = raise_in_loop(2)
+
+    text = FastFormatter().formatException(first)
+    assert text == logging.Formatter().formatException(second)
+    assert FastFormatter('%(name)s').formatException(second) is text
+
+
+def test_exception_text_not_shared_between_different_exceptions():
+    first, = raise_in_loop(1, 'foo')
+    second, = raise_in_loop(1, 'bar')
+
+    assert 'bar' in FastFormatter().formatException(second)
+    assert 'foo' in FastFormatter().formatException(first)
+
+
+def test_exception_key_tells_apart_calls_on_same_line():
+    def boom():
+        raise ValueError('oops')
+
+    exc_infos = []
+    for i in range(2):
+        try:
+            (i and boom()) or boom()
+        except ValueError:
+            exc_infos.append(sys.exc_info())
+
+    first, second = exc_infos
+    assert exc_info_key(first) != exc_info_key(second)
+
+
+def test_exception_text_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(formatting, '_exc_text_cache', {})
+    monkeypatch.setattr(formatting, '_exc_text_order', [])
+    monkeypatch.setattr(formatting, 'EXC_TEXT_CACHE_SIZE', 2)
+    formatter = FastFormatter()
+
+    foo, = raise_in_loop(1, 'foo')
+    bar, = raise_in_loop(1, 'bar')
+    baz, = raise_in_loop(1, 'baz')
+    text = formatter.formatException(foo)
+    formatter.formatException(bar)
+    formatter.formatException(foo)
+    formatter.formatException(baz)  # evicts 'bar'
+
+    assert formatter.formatException(foo) is text
+    assert set(formatting._exc_text_cache) == set([exc_info_key(foo),
+                                                   exc_info_key(baz)])
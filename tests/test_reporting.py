@@ -1,7 +1,19 @@
 # -*- coding: utf-8 -*-
 import os
+import json
+import logging
+import socket
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import closing
+
+import py
 import pytest
 
+from pytest_catchlog.common import catching_logs
+
 
 def test_nothing_logged(testdir):
     testdir.makepyfile('''
@@ -111,6 +123,23 @@ def test_disable_log_capturing(testdir):
         result.stdout.fnmatch_lines(['*- Captured *log call -*'])
 
 
+def test_no_capturing_unless_needed(testdir):
+    testdir.makepyfile('''
+        import logging
+
+        logger = logging.getLogger(__name__)
+
+        def test_foo():
+            assert not logger.isEnabledFor(logging.INFO)
+
+        def test_bar(caplog):
+            logger.info('boo')
+            assert [r.msg for r in caplog.records] == ['boo']
+        ''')
+    result = testdir.runpytest_subprocess('--no-print-logs')
+    assert result.ret == 0
+
+
 def test_disable_log_capturing_ini(testdir):
     testdir.makeini(
         '''
@@ -396,3 +425,704 @@ def test_log_file_ini_level(testdir):
         contents = rfh.read()
         assert "This log message will be shown" in contents
         assert "This log message won't be shown" not in contents
+
+
+def test_log_file_not_created_until_written(testdir):
+    log_file = testdir.tmpdir.join('pytest.log').strpath
+
+    testdir.makepyfile('''
+        import logging
+        def test_log_file():
+            logging.getLogger('catchlog').info("Below the log file level")
+    ''')
+
+    result = testdir.runpytest('--log-file={0}'.format(log_file))
+
+    assert result.ret == 0
+    assert not os.path.exists(log_file)
+
+
+def test_optional_features_not_imported(testdir):
+    testdir.makepyfile('''
+        import sys
+
+        def test_foo():
+            for name in ['benchmarking', 'binlog', 'logdb', 'metrics',
+                         'overhead', 'profile', 'socketlog', 'store']:
+                assert 'pytest_catchlog.' + name not in sys.modules
+    ''')
+    result = testdir.runpytest_subprocess()
+    assert result.ret == 0
+
+
+def test_log_file_binary(testdir):
+    from pytest_catchlog.binlog import iter_records
+    from pytest_catchlog.dump import main as dump_main
+
+    testdir.makepyfile('''
+        import logging
+        logger = logging.getLogger('catchlog')
+
+        def setup_function(function):
+            logger.warning("setting %s up", function.__name__)
+
+        def test_foo():
+            logger.warning("going %s %d", 'to', 42)
+            logger.info("This log message won't be shown")
+            logger.error("with a %r", {'dict': 1})
+
+        def test_bar():
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                logger.exception("oops")
+    ''')
+    log_file = testdir.tmpdir.join('pytest.log').strpath
+
+    result = testdir.runpytest('--log-file={0}'.format(log_file),
+                               '--log-file-binary')
+    assert result.ret == 0
+
+    with open(log_file, 'rb') as stream:
+        records = list(iter_records(stream))
+    assert [(r.nodeid.split('::')[-1], r.phase, r.name, r.levelno,
+             r.getMessage()) for r in records] == [
+        ('test_foo', 'setup', 'catchlog', logging.WARNING, 'setting test_foo up'),
+        ('test_foo', 'call', 'catchlog', logging.WARNING, 'going to 42'),
+        ('test_foo', 'call', 'catchlog', logging.ERROR, "with a {'dict': 1}"),
+        ('test_bar', 'setup', 'catchlog', logging.WARNING, 'setting test_bar up'),
+        ('test_bar', 'call', 'catchlog', logging.ERROR, 'oops'),
+    ]
+    assert 'ZeroDivisionError' in records[-1].exc_text
+
+    out = py.io.TextIO()
+    dump_main([log_file, '--nodeid=test_foo', '--level=ERROR',
+               '--format=%(phase)s %(levelname)s %(message)s'], out=out)
+    assert out.getvalue() == "call ERROR with a {'dict': 1}\n"
+
+    with pytest.raises(SystemExit):
+        dump_main([log_file, '--level=NOPE'], out=out)
+
+
+def test_log_db(testdir):
+    from pytest_catchlog.query import main as query_main
+
+    testdir.makepyfile('''
+        import logging
+        logger = logging.getLogger('catchlog')
+
+        def setup_function(function):
+            logger.debug("setting %s up", function.__name__)
+
+        def test_foo():
+            logger.info("going %s %d", 'to', 42)
+            logging.getLogger('catchlog.db').warning("slow query")
+
+        def test_bar():
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                logger.exception("oops")
+            logging.getLogger('other').error("slow response")
+    ''')
+    log_db = testdir.tmpdir.join('pytest.sqlite').strpath
+
+    result = testdir.runpytest('--log-db={0}'.format(log_db), '--log-db-fts')
+    assert result.ret == 0
+
+    def query(*args):
+        out = py.io.TextIO()
+        query_main([log_db, '--format=%(nodeid)s %(phase)s %(name)s '
+                    '%(levelname)s %(message)s'] + list(args), out=out)
+        return out.getvalue().splitlines()
+
+    assert query('--nodeid=test_log_db.py::test_foo') == [
+        'test_log_db.py::test_foo setup catchlog DEBUG setting test_foo up',
+        'test_log_db.py::test_foo call catchlog INFO going to 42',
+        'test_log_db.py::test_foo call catchlog.db WARNING slow query',
+    ]
+    lines = query('--logger=catchlog', '--level=WARNING')
+    assert lines[:3] == [
+        'test_log_db.py::test_foo call catchlog.db WARNING slow query',
+        'test_log_db.py::test_bar call catchlog ERROR oops',
+        'Traceback (most recent call last):',
+    ]
+    assert lines[-1].startswith('ZeroDivisionError')
+    assert query('--grep=slow', '--phase=call') == [
+        'test_log_db.py::test_foo call catchlog.db WARNING slow query',
+        'test_log_db.py::test_bar call other ERROR slow response',
+    ]
+
+    with closing(sqlite3.connect(log_db)) as connection:
+        indexes = set(name for name, in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"))
+    assert set(['records_nodeid', 'records_levelno',
+                'records_name']) <= indexes
+
+
+def test_log_db_query_nodeids():
+    from pytest_catchlog.logdb import INSERT, create_schema, query
+
+    with closing(sqlite3.connect(':memory:')) as connection:
+        create_schema(connection)
+        for nodeid in ['t.py::test_a', 't.py::test_ab', 't.py::test_a[1]',
+                       't.py::test_a[2]', 'u.py::test_a']:
+            connection.execute(INSERT, (nodeid, 'call', 0.0, 'foo', 20,
+                                        'foo.py', 1, nodeid, None))
+
+        def nodeids(*args, **kwargs):
+            return [r.nodeid for r in query(connection, args, **kwargs)]
+
+        assert nodeids('t.py::test_a') == [
+            't.py::test_a', 't.py::test_a[1]', 't.py::test_a[2]']
+        assert nodeids('t.py::test_a[1]', 't.py::test_ab') == [
+            't.py::test_ab', 't.py::test_a[1]']
+        assert nodeids('t.py', nodeid_prefix=True) == [
+            't.py::test_a', 't.py::test_ab', 't.py::test_a[1]',
+            't.py::test_a[2]']
+
+
+def test_log_db_fts_unavailable(testdir):
+    testdir.makeconftest('''
+        from pytest_catchlog import logdb
+
+        logdb.FTS_SCHEMA = [
+            'CREATE VIRTUAL TABLE records_fts USING no_such_module(message)']
+    ''')
+    testdir.makepyfile('''
+        def test_foo():
+            pass
+    ''')
+    result = testdir.runpytest_subprocess('--log-db=pytest.sqlite',
+                                          '--log-db-fts')
+    assert result.ret != 0
+    result.stderr.fnmatch_lines([
+        '*--log-db-fts: full-text search is not available*',
+    ])
+
+
+def test_log_store(testdir):
+    testdir.makepyfile('''
+        import logging
+        import pytest
+
+        @pytest.mark.parametrize('arg', [1, 2])
+        def test_foo(arg):
+            logging.getLogger('catchlog').info('%s to the store', 'going')
+            assert False
+
+        def test_bar():
+            logging.getLogger('catchlog').info('passing logs are %s', 'stored')
+    ''')
+    stale = testdir.tmpdir.join('.cache', 'd', 'catchlog', 'stale.log')
+    stale.write('from an older session', ensure=True)
+    stale.setmtime(stale.mtime() - 8 * 86400)  # older than 7 days
+    result = testdir.runpytest('--log-store', '--junitxml=junit.xml')
+    assert result.ret == 1
+    result.stdout.fnmatch_lines(['*- Captured log call -*',
+                                 'sha1:* *.log'])
+    assert 'going to the store' not in result.stdout.str()
+    assert 'going to the store' not in testdir.tmpdir.join(
+        'junit.xml').read()
+
+    # Identical logs are stored once.
+    references = set(line for line in result.stdout.lines
+                     if line.startswith('sha1:'))
+    assert len(references) == 1
+    stored = py.path.local(references.pop().split(' ', 1)[1])
+    assert 'going to the store' in stored.read()
+    logs = stored.dirpath().listdir()  # 'stale.log' pruned
+    assert len(logs) == 2 and stored in logs
+    assert any('passing logs are stored' in log.read() for log in logs)
+
+    # Logs of earlier sessions are kept for a while, still referenced.
+    for log in logs:
+        log.setmtime(log.mtime() - 3600)
+    result = testdir.runpytest('--log-store', '-k', 'test_bar')
+    assert result.ret == 0
+    assert sorted(stored.dirpath().listdir()) == sorted(logs)
+
+    result = testdir.runpytest('--log-store', '-k', 'test_bar',
+                               '--log-store-max-age=0.01')
+    assert result.ret == 0
+    assert stored.dirpath().listdir() == [
+        log for log in logs if log != stored]
+
+
+def test_capture_markers(testdir):
+    testdir.makepyfile('''
+        import logging
+        import pytest
+
+        logger = logging.getLogger(__name__)
+
+        @pytest.mark.no_log_capture
+        def test_no_capture():
+            assert not logger.isEnabledFor(logging.INFO)
+            logger.info('%s captured', 'not')
+            assert False
+
+        @pytest.mark.no_log_capture
+        def test_no_capture_caplog(caplog):
+            logger.info('only in %s', 'caplog')
+            assert caplog.records
+            assert False
+
+        @pytest.mark.log_capture_level('info')
+        def test_level():
+            logger.debug('%s the level', 'below')
+            logger.info('%s the level', 'at')
+            assert False
+
+        @pytest.mark.log_capture_limit(records=2)
+        def test_limit(caplog):
+            for i in range(5):
+                logger.info('record %d', i)
+            assert len(caplog.records) == 2
+            assert caplog.dropped == 3
+            assert False
+        ''')
+    result = testdir.runpytest_subprocess()
+    assert result.ret == 1
+    out = result.stdout.str()
+    assert 'not captured' not in out
+    assert 'only in caplog' not in out
+    assert 'below the level' not in out
+    result.stdout.fnmatch_lines(['*- Captured log call -*',
+                                 '*at the level',
+                                 '*- Captured log call -*',
+                                 '*record 0',
+                                 '*record 1',
+                                 '... 3 more records dropped*'])
+
+@pytest.mark.parametrize('marker, error', [
+    ('log_capture_level',
+     'test_foo: log_capture_level expects exactly one argument (level)'),
+    ('log_capture_level("INFO", level="DEBUG")',
+     'test_foo: log_capture_level expects exactly one argument (level)'),
+    ('log_capture_level(None)',
+     "'None' is not recognized as a logging level name for "
+     "'test_malformed_marker.py::test_foo: log_capture_level'*"),
+    ('log_capture_limit',
+     'test_foo: log_capture_limit expects exactly one argument (records)'),
+    ('log_capture_limit(records="many")',
+     "test_foo: log_capture_limit expects a number of records, got 'many'"),
+])
+def test_malformed_marker(testdir, marker, error):
+    testdir.makepyfile('''
+        import pytest
+
+        @pytest.mark.{0}
+        def test_foo():
+            pass
+        '''.format(marker))
+    result = testdir.runpytest()
+    assert result.ret == 1
+    result.stdout.fnmatch_lines(['*UsageError: *' + error])
+
+
+@pytest.mark.parametrize('args, captured, suppressed', [
+    ([], 1, 10),
+    (['--log-benchmark-capture'], 11, 0),
+])
+def test_benchmark_records_suppressed(testdir, args, captured, suppressed):
+    pytest.importorskip('pytest_benchmark')
+    testdir.makepyfile('''
+        import logging
+
+        logger = logging.getLogger(__name__)
+
+        def target():
+            logger.info('%s run', 'benchmarked')
+
+        def test_foo(benchmark, caplog):
+            benchmark.pedantic(target, rounds=5, iterations=2)
+            assert len(caplog.records) == {0}
+            assert False
+        '''.format(captured))
+    result = testdir.runpytest(*args)
+    assert result.ret == 1
+    result.stdout.fnmatch_lines(['*- Captured log call -*'])
+    if suppressed:
+        result.stdout.fnmatch_lines(
+            ['... {0} records suppressed while benchmarking'.format(suppressed)])
+    else:
+        assert 'while benchmarking' not in result.stdout.str()
+
+
+def test_log_flight_recorder(testdir):
+    testdir.makepyfile('''
+        import logging
+
+        logger = logging.getLogger(__name__)
+
+        def test_passing():
+            logger.info('%s passing', 'recorded')
+
+        def test_failing():
+            for i in range(5):
+                logger.info('%s %d', 'failing', i)
+            assert False
+
+        def test_error_logged():
+            for i in range(5):
+                logger.info('%s %d', 'before error', i)
+            logger.error('%s error', 'logged')
+            logger.info('%s error', 'after')
+        ''')
+    result = testdir.runpytest('--log-flight-recorder=2', '-rP')
+    assert result.ret == 1
+    out = result.stdout.str()
+    assert 'recorded passing' not in out
+    assert 'failing 2' not in out
+    result.stdout.fnmatch_lines(['*- Captured log call -*',
+                                 '*failing 3',
+                                 '*failing 4'])
+    # A passing test reports (with -rP) the records up to the error.
+    assert 'after error' not in out
+    assert 'before error 2' not in out
+    result.stdout.fnmatch_lines(['*before error 3',
+                                 '*before error 4',
+                                 '*logged error'])
+
+
+def test_log_flight_recorder_caplog_requested_dynamically(testdir):
+    testdir.makepyfile('''
+        import logging
+
+        logger = logging.getLogger(__name__)
+
+        def test_foo(request):
+            logger.info('before')
+            caplog = request.getfuncargvalue('caplog')
+            logger.info('after')
+            assert [r.getMessage() for r in caplog.records] == [
+                'before', 'after']
+            assert 'before' in caplog.text
+        ''')
+    result = testdir.runpytest('--log-flight-recorder=2')
+    assert result.ret == 0
+
+
+def test_log_rerun_failed(testdir):
+    testdir.makepyfile('''
+        import logging
+
+        logger = logging.getLogger(__name__)
+        runs = []
+
+        def test_foo():
+            runs.append(1)
+            logger.debug('%s run %d', 'debugging', len(runs))
+            logger.warning('%s run %d', 'warning', len(runs))
+            assert False
+
+        def test_bar():
+            logger.debug('%s run', 'passing')
+        ''')
+    result = testdir.runpytest('--log-capture-level=WARNING',
+                               '--log-rerun-failed')
+    assert result.ret == 1
+    result.stdout.fnmatch_lines(['*- Captured log call -*',
+                                 '*warning run 1',
+                                 '*- Captured log call (rerun at DEBUG) -*',
+                                 '*debugging run 2',
+                                 '*warning run 2',
+                                 '*1 failed, 1 passed*'])
+    out = result.stdout.str()
+    assert 'debugging run 1' not in out
+    assert 'passing run' not in out
+
+
+def test_log_rerun_failed_keeps_shared_fixtures(testdir):
+    testdir.makeconftest('''
+        import pytest
+
+        @pytest.yield_fixture(scope='session')
+        def resource():
+            with open('setups.txt', 'a') as fh:
+                fh.write('setup\\n')
+            yield
+    ''')
+    testdir.makepyfile('''
+        import logging
+
+        def test_foo(resource):
+            logging.getLogger('catchlog').info('%s to the file', 'going')
+            assert False
+
+        def test_bar(resource):
+            assert False
+        ''')
+    log_file = testdir.tmpdir.join('pytest.log')
+    result = testdir.runpytest('--log-rerun-failed', '--log-file-level=INFO',
+                               '--log-file={0}'.format(log_file))
+    assert result.ret == 1
+    result.stdout.fnmatch_lines(['*- Captured log call (rerun at DEBUG) -*',
+                                 '*going to the file',
+                                 '*2 failed*'])
+    # Once for the run, once for all the reruns.
+    assert testdir.tmpdir.join('setups.txt').read() == 'setup\nsetup\n'
+    # Records of the rerun are not logged again.
+    assert log_file.read().count('going to the file') == 1
+
+
+def test_log_profile(testdir):
+    testdir.makepyfile('''
+        import logging
+
+        logger = logging.getLogger('catchlog')
+
+        def test_foo():
+            for i in range(3):
+                logger.info('hot %d', i)
+            logger.warning('cold')
+        ''')
+    profile_file = testdir.tmpdir.join('profile.json')
+    result = testdir.runpytest('--log-profile',
+                               '--log-profile-file={0}'.format(profile_file))
+    assert result.ret == 0
+    result.stdout.fnmatch_lines(['*log profile: top 2 of 2 call sites*',
+                                 '*records*KiB*ms*'])
+    # Sorted by the time spent, which varies.
+    result.stdout.fnmatch_lines([
+        '*3 * INFO * catchlog *test_log_profile.py:7'])
+    result.stdout.fnmatch_lines([
+        '*1 * WARNING * catchlog *test_log_profile.py:8'])
+
+    sites = dict((site['lineno'], site)
+                 for site in json.loads(profile_file.read()))
+    assert sites[7]['count'] == 3
+    assert sites[7]['bytes'] > 0
+    assert sites[8]['levelname'] == 'WARNING'
+
+
+def test_log_overhead(testdir):
+    testdir.makepyfile('''
+        import logging
+
+        def test_foo():
+            logging.getLogger('catchlog').info('boo')
+
+        def test_bar():
+            pass
+        ''')
+    result = testdir.runpytest('--log-overhead')
+    assert result.ret == 0
+    result.stdout.fnmatch_lines([
+        '*catchlog overhead: *s total, *% of *s*',
+        'hook*calls*total ms*p50 us*p90 us*p99 us*max us',
+        'setup *2 *',
+        'call *2 *',
+        'teardown *2 *',
+        'runtestloop *1 *',
+        'records *1 *',
+    ])
+
+
+def test_log_metrics(testdir):
+    testdir.makepyfile('''
+        import logging
+
+        def test_foo():
+            for i in range(3):
+                logging.getLogger('app.db').info('query %d', i)
+            logging.getLogger('app.http').warning(u'sl\\xf6w')
+
+        def test_bar():
+            logging.getLogger('app.db').debug('connected')
+        ''')
+    result = testdir.runpytest_subprocess('--log-metrics=metrics.json',
+                               '--log-format=%(message)s')
+    assert result.ret == 0
+    result.stdout.fnmatch_lines(['*log metrics: written into metrics.json*'])
+
+    with open(str(testdir.tmpdir.join('metrics.json'))) as fh:
+        metrics = json.load(fh)
+    # Sizes are of UTF-8 encoded lines, 'sl\xf6w' takes 5 bytes.
+    assert metrics['total'] == {'records': 5, 'bytes': 35}
+    assert metrics['loggers'] == {
+        'app.db': {'INFO': {'records': 3, 'bytes': 21},
+                   'DEBUG': {'records': 1, 'bytes': 9}},
+        'app.http': {'WARNING': {'records': 1, 'bytes': 5}},
+    }
+    assert metrics['tests'] == {
+        'test_log_metrics.py::test_foo': {'records': 4, 'bytes': 26},
+        'test_log_metrics.py::test_bar': {'records': 1, 'bytes': 9},
+    }
+    assert [logger['name'] for logger in metrics['top_loggers']] == [
+        'app.db', 'app.http']
+    assert metrics['top_tests'][0]['nodeid'] == 'test_log_metrics.py::test_foo'
+
+    result = testdir.runpytest_subprocess('--log-metrics=metrics.prom',
+                               '--log-format=%(message)s')
+    assert result.ret == 0
+    text = testdir.tmpdir.join('metrics.prom').read()
+    assert 'catchlog_records_total{logger="app.db",level="INFO"} 3\n' in text
+    assert 'catchlog_bytes_total{logger="app.http",level="WARNING"} 5\n' in text
+    assert ('catchlog_test_records_total'
+            '{nodeid="test_log_metrics.py::test_foo"} 4\n') in text
+    assert text.endswith('# EOF\n')
+
+
+class CollectorStub(object):
+    """Receives batches sent by --log-socket, in a thread."""
+
+    def __init__(self, family, address):
+        self.server = socket.socket(family, socket.SOCK_STREAM)
+        self.server.bind(address)
+        self.server.listen(1)
+        self.server.settimeout(0.05)
+        self.batches = []
+        self.connections = 0
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def records(self):
+        return [record for batch in self.batches for record in batch]
+
+    def serve(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except socket.timeout:
+                # Only once stopped and no connection is pending any more.
+                if self.stopping.is_set():
+                    break
+                continue
+            self.connections += 1
+            connection.settimeout(None)
+            with closing(connection):
+                stream = connection.makefile('rb')
+                while True:
+                    header = stream.read(4)
+                    if len(header) < 4:
+                        break
+                    length, = struct.unpack('>I', header)
+                    self.batches.append(json.loads(
+                        stream.read(length).decode('utf-8')))
+                stream.close()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+        self.server.close()
+
+
+def test_log_socket(testdir):
+    testdir.makepyfile('''
+        import logging
+        logger = logging.getLogger('catchlog')
+
+        def setup_function(function):
+            logger.debug("setting %s up", function.__name__)
+
+        def test_foo():
+            logger.info("going %s %d", 'to', 42)
+
+        def test_bar():
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                logger.exception("oops")
+    ''')
+    collector = CollectorStub(socket.AF_INET, ('127.0.0.1', 0))
+    try:
+        result = testdir.runpytest('--log-socket=127.0.0.1:{0}'.format(
+            collector.server.getsockname()[1]))
+        assert result.ret == 0
+    finally:
+        collector.stop()
+
+    assert collector.connections == 1
+    assert [(r['nodeid'], r['phase'], r['name'], r['levelname'], r['message'])
+            for r in collector.records] == [
+        ('test_log_socket.py::test_foo', 'setup', 'catchlog', 'DEBUG',
+         'setting test_foo up'),
+        ('test_log_socket.py::test_foo', 'call', 'catchlog', 'INFO',
+         'going to 42'),
+        ('test_log_socket.py::test_bar', 'setup', 'catchlog', 'DEBUG',
+         'setting test_bar up'),
+        ('test_log_socket.py::test_bar', 'call', 'catchlog', 'ERROR', 'oops'),
+    ]
+    assert 'ZeroDivisionError' in collector.records[-1]['exc_text']
+
+
+def test_log_socket_invalid_address(testdir):
+    testdir.makepyfile('''
+        def test_foo():
+            pass
+    ''')
+    result = testdir.runpytest('--log-socket=localhost')
+    assert result.ret != 0
+    result.stderr.fnmatch_lines([
+        "*--log-socket: 'localhost' is neither 'host:port' nor 'unix:/path'",
+    ])
+
+
+def test_parse_socket_address():
+    from pytest_catchlog.socketlog import parse_address
+
+    assert parse_address('127.0.0.1:5170') == (socket.AF_INET,
+                                                ('127.0.0.1', 5170))
+    for address in ['::1:5170', '[::1]', 'localhost:port']:
+        with pytest.raises(ValueError):
+            parse_address(address)
+
+
+@pytest.mark.skipif(not socket.has_ipv6, reason='IPv6 is not available')
+def test_parse_socket_address_ipv6():
+    from pytest_catchlog.socketlog import parse_address
+
+    family, address = parse_address('[::1]:5170')
+    assert family == socket.AF_INET6
+    assert address[:2] == ('::1', 5170)
+
+
+def test_encode_batch_falls_back_to_repr():
+    from pytest_catchlog.socketlog import encode_batch
+
+    unencodable = object()
+    data = encode_batch([
+        ('test_foo', 'call', 0.0, 'foo', 10, 'DEBUG', unencodable, 1,
+         'first', None),
+        ('test_foo', 'call', 0.0, 'foo', 10, 'DEBUG', 'foo.py', 2,
+         'second', None),
+    ])
+    first, second = json.loads(data[4:].decode('utf-8'))
+    assert first['pathname'] == repr(unencodable)
+    assert first['message'] == 'first'
+    assert second['pathname'] == 'foo.py'
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'),
+                    reason='Unix sockets are not available')
+def test_socket_handler_reconnects(tmpdir):
+    from pytest_catchlog.socketlog import SocketLogHandler
+
+    path = tmpdir.join('collector.sock').strpath
+    handler = SocketLogHandler(socket.AF_UNIX, path, queue_size=3,
+                               batch_size=2, interval=0.2)
+    logger = logging.getLogger('catchlog.socket')
+    logger.propagate = False
+    try:
+        with catching_logs(handler, logger=logger):
+            # Queued before the first attempt to send, the oldest records
+            # don't fit.
+            for i in range(5):
+                logger.warning('record %d', i)
+            # Nobody is listening yet, the batch is kept for later.
+            while handler._batch is None:
+                time.sleep(0.01)
+            collector = CollectorStub(socket.AF_UNIX, path)
+        collector.stop()
+    finally:
+        logger.propagate = True
+
+    assert collector.connections == 1
+    assert [[r['message'] for r in batch] for batch in collector.batches] == [
+        ['record 2', 'record 3'], ['record 4']]
+    assert handler.dropped == 2